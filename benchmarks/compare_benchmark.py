@@ -0,0 +1,83 @@
+""" Scaling of tfg_nlp.compare_resource_keywords_uri against the previous implementation.
+
+The previous implementation drops the rows of every unknown uri one at a
+time, scanning the whole file each time. Run from the benchmarks directory:
+
+    python compare_benchmark.py --sizes 2000 4000 8000 16000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+# Same imports as the tests: modules of src by name and tfg_nlp through the src package
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [os.path.join(ROOT, 'src'), ROOT]
+
+from src.tfg_nlp import compare_resource_keywords_uri, compare_resource_keywords_uri_stream
+
+
+def legacy_compare_resource_keywords_uri(file1, dict):
+    # Previous implementation
+    df_file = pd.read_csv(file1, delimiter=',')
+
+    for u in df_file['keyword']:
+        if u not in dict.keys():
+            badwords = df_file[df_file['keyword'] == u].index
+            df_file.drop(badwords, inplace=True)
+
+    df_file.drop_duplicates(subset=None, keep="first", inplace=True)
+    df_file.to_csv(file1, index=False)
+
+
+def write_rows(path, n_rows, seed=0):
+    # Researchers with uris, a third of them not in the compacting dictionary and some repeated rows
+    rng = random.Random(seed)
+    n_uris = max(1, n_rows // 4)
+    uris = ['http://www.wikidata.org/entity/Q{}'.format(i) for i in range(n_uris)]
+    rows = [('https://experts.udl.cat/individual/UDL-{:08d}'.format(rng.randrange(n_rows // 10 + 1)),
+             rng.choice(uris)) for _ in range(n_rows)]
+    pd.DataFrame(rows, columns=['resource', 'keyword']).to_csv(path, index=False)
+    return {uri: [] for uri in uris if rng.random() < 2 / 3}
+
+
+def measure(compare, path, uris, source):
+    with open(source, 'rb') as f_in, open(path, 'wb') as f_out:
+        f_out.write(f_in.read())
+    start = time.perf_counter()
+    compare(path, uris)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of compare_resource_keywords_uri")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[2000, 4000, 8000, 16000])
+    parser.add_argument('--legacy-max', type=int, default=32000, help="largest size run with the previous version")
+    args = parser.parse_args()
+
+    candidates = [('legacy', legacy_compare_resource_keywords_uri),
+                  ('set filter', compare_resource_keywords_uri),
+                  ('streaming', lambda path, uris: compare_resource_keywords_uri_stream(path, uris, chunksize=10000))]
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'source.csv')
+        path = os.path.join(directory, 'replace-keywords-uri.csv')
+        print("{:>9} {:>12} {:>12} {:>12}".format('rows', *(name for name, _ in candidates)))
+        for size in args.sizes:
+            uris = write_rows(source, size)
+            times = []
+            outputs = []
+            for name, compare in candidates:
+                if name == 'legacy' and size > args.legacy_max:
+                    times.append(float('nan'))
+                    continue
+                times.append(measure(compare, path, uris, source))
+                with open(path, encoding='utf-8') as f_in:
+                    outputs.append(f_in.read())
+            same = all(output == outputs[0] for output in outputs)
+            cells = ["{:>11.3f}s".format(t) if t == t else "{:>12}".format('-') for t in times]
+            print("{:>9} {} same output: {}".format(size, " ".join(cells), same))
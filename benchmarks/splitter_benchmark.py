@@ -0,0 +1,75 @@
+""" Throughput of tfg_nlp.splitter against the previous implementation.
+
+Run from the benchmarks directory:
+
+    python splitter_benchmark.py ../files/samples_researchers_publications-keywords.csv --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Same imports as the tests: modules of src by name and tfg_nlp through the src package
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [os.path.join(ROOT, 'src'), ROOT]
+
+from src.tfg_nlp import correct_keywords_file, splitter
+
+
+def legacy_splitter(df):
+    # Previous implementation, with str.partition('(') fixed to keep the text before the parenthesis
+    df['keyword'] = df['keyword'].str.replace(r"\s*\([^()]*\)", "", regex=True).str.strip()
+    df['keyword'] = df['keyword'].str.partition('(')[0]
+    df['keyword'] = df['keyword'].str.replace(r"(\s*\[.*?\]\s*)", "", regex=True).str.strip()
+
+    df['keyword'] = df['keyword'].str.split(r'[;,/]|\. |- | -')
+    df = df.explode('keyword')
+    df['keyword'] = df['keyword'].str.strip()
+
+    nan_value = float("NaN")
+    df.replace("", nan_value, inplace=True)
+    df.dropna(subset=['keyword'], inplace=True)
+
+    return df
+
+
+def measure(split, df, runs):
+    # Best time of several runs, every run over a fresh copy
+    best = float('inf')
+    for _ in range(runs):
+        data = df.copy()
+        start = time.perf_counter()
+        result = split(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark of the keywords splitter")
+    parser.add_argument('file', help="researcher/keyword CSV file")
+    parser.add_argument('--repeat', type=int, default=1, help="times the rows of the file are repeated")
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    corrected = args.file + '.corrected'
+    correct_keywords_file(args.file, corrected)
+    df = pd.read_csv(corrected, delimiter=',')
+    os.remove(corrected)
+    df = pd.concat([df] * args.repeat, ignore_index=True)
+    print("{} rows".format(len(df)))
+
+    legacy_time, expected = measure(legacy_splitter, df, args.runs)
+    print("legacy splitter:          {:.3f}s ({:.0f} rows/s)".format(legacy_time, len(df) / legacy_time))
+
+    candidates = [('splitter', splitter), ('splitter string[pyarrow]', lambda d: splitter(d, 'string[pyarrow]'))]
+    for name, split in candidates:
+        try:
+            elapsed, result = measure(split, df, args.runs)
+        except ImportError as e:
+            print("{}: skipped ({})".format(name, e))
+            continue
+        same = result.astype({'keyword': object}).equals(expected)
+        print("{:<25} {:.3f}s ({:.0f} rows/s), {:.1f}x, same output: {}".format(
+            name + ':', elapsed, len(df) / elapsed, legacy_time / elapsed, same))
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import time
+
+import aiohttp
+
+import linking_entity_linking
+from http_client import retry_after_seconds
+from link_cache import MISSING
+from linking_entity_linking import WikidataEntityLinker
+
+logger = logging.getLogger(__name__)
+
+# Requests per second allowed by default on every endpoint
+DEFAULT_RATE_LIMITS = {
+    'wikidata': 10,
+    'spotlight': 5
+}
+
+
+class TokenBucket:
+    """ Token bucket rate limiter for asyncio.
+
+    Parameters
+    ----------
+    rate : float
+        Tokens added per second, i.e. sustained requests per second.
+    capacity : float, optional
+        Maximum tokens stored, i.e. size of a burst. Defaults to rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        # Stop handing out tokens for a while (e.g. after a Retry-After)
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncEntityLinker:
+    """ Link thousands of keywords concurrently to Wikidata and DBpedia.
+
+    Every endpoint has its own token bucket, throttled answers (403/429)
+    pause the bucket for the time given in Retry-After, and at most
+    max_in_flight requests are waiting for an answer at the same time.
+
+    Parameters
+    ----------
+    rate_limits : dict, optional
+        Requests per second by endpoint ('wikidata', 'spotlight').
+    max_in_flight : int
+        Maximum number of concurrent requests.
+    max_retries : int
+        Retries of a throttled request before giving up.
+    throttling_time : float
+        Seconds waited after a throttled answer without Retry-After.
+    timeout : float
+        Seconds to wait for every request.
+    cache : LinkCache, optional
+        Persistent cache shared with the synchronous linkers.
+    """
+
+    def __init__(self, rate_limits=None, max_in_flight=100, max_retries=5, throttling_time=5,
+                 timeout=30, cache=None):
+        self.rate_limits = dict(DEFAULT_RATE_LIMITS, **(rate_limits or {}))
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.throttling_time = throttling_time
+        self.timeout = timeout
+        self.cache = cache
+        self.wikidata = WikidataEntityLinker()
+
+    async def get(self, endpoint, url, params, headers=None):
+        for attempt in range(self.max_retries + 1):
+            await self.buckets[endpoint].acquire()
+            async with self.window:
+                async with self.session.get(url, params=params, headers=headers) as res:
+                    if res.status in (403, 429):
+                        delay = retry_after_seconds(res.headers.get('Retry-After'), self.throttling_time)
+                        logger.warning("%s limit reached. Retrying in %.1f seconds...", endpoint, delay)
+                        self.buckets[endpoint].pause(delay)
+                        continue
+                    res.raise_for_status()
+                    return await res.text()
+
+        raise aiohttp.ClientError(f"{endpoint} still throttled after {self.max_retries} retries")
+
+    async def cached(self, key, lookup):
+        # Run every distinct lookup once, even when several keywords ask for it at the same time
+        if key not in self.lookups:
+            self.lookups[key] = asyncio.ensure_future(self.safe(key, lookup))
+        return await self.lookups[key]
+
+    async def safe(self, key, lookup):
+        # A failed lookup is left without link (and out of the cache) instead of stopping the batch
+        try:
+            return await lookup()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error("Linking %s failed: %s", key, e)
+            return None
+
+    async def link_entity(self, entity_label, language):
+        """ Async version of WikidataEntityLinker.link_entity. """
+        base = linking_entity_linking.WIKIDATA_BASE
+        if self.cache is not None:
+            uri = self.cache.get(base, entity_label, language)
+            if uri is not MISSING:
+                return uri
+
+        params = {'action': 'wbsearchentities', 'search': entity_label, 'limit': 15,
+                  'language': language, 'format': 'json'}
+        text = await self.get('wikidata', f"{base}/api.php", params)
+
+        uri = None
+        try:
+            search_results = json.loads(text)['search']
+        except (ValueError, KeyError):
+            # invalid entity
+            search_results = []
+        result = self.wikidata.pick_preferred(search_results)
+        if result is not None:
+            uri = result['concepturi']
+
+        if self.cache is not None:
+            self.cache.set(base, entity_label, language, uri)
+        return uri
+
+    async def link_entities(self, text):
+        """ Async version of DBPediaEntityLinker.link_entities. """
+        base = linking_entity_linking.DBPEDIA_SPOTLIGHT_BASE
+        if self.cache is not None:
+            uri = self.cache.get(base, text)
+            if uri is not MISSING:
+                return uri
+
+        content = await self.get('spotlight', f"{base}/annotate", {'text': text},
+                                 headers={"accept": "application/json"})
+        try:
+            res_dict = json.loads(content)
+        except ValueError:
+            logger.warning("Decoding JSON has failed")
+            return None
+
+        uri = None
+        if res_dict.get('Resources'):
+            uri = res_dict['Resources'][0]['@URI']
+
+        if self.cache is not None:
+            self.cache.set(base, text, '', uri)
+        return uri
+
+    async def link_wikidata(self, keyword, lang, lemma):
+        # Same fallback as tfg_nlp.link_keyword: the lemma first, then the keyword
+        uri = await self.cached(('wikidata', lemma, lang), lambda: self.link_entity(lemma, lang))
+        if uri is None:
+            uri = await self.cached(('wikidata', keyword, lang), lambda: self.link_entity(keyword, lang))
+        return uri
+
+    async def link_dbpedia(self, keyword, lemma):
+        uri = await self.cached(('spotlight', lemma), lambda: self.link_entities(lemma))
+        if uri is None:
+            uri = await self.cached(('spotlight', keyword), lambda: self.link_entities(keyword))
+        return uri
+
+    async def link_keyword(self, keyword, lang, lemma):
+        wikidata, dbpedia = await asyncio.gather(self.link_wikidata(keyword, lang, lemma),
+                                                 self.link_dbpedia(keyword, lemma))
+        return keyword, {'Wikidata': wikidata, 'DBpedia': dbpedia}
+
+    async def link_keywords(self, keywords):
+        """ Link a batch of keywords concurrently.
+
+        Parameters
+        ----------
+        keywords : dict
+            Mapping keyword -> (language, lemma).
+
+        Returns
+        -------
+        dict
+            Mapping keyword -> {'Wikidata': uri, 'DBpedia': uri}, the same
+            links process() stores for every keyword.
+        """
+        self.buckets = {endpoint: TokenBucket(rate) for endpoint, rate in self.rate_limits.items()}
+        self.window = asyncio.Semaphore(self.max_in_flight)
+        self.lookups = {}
+
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as self.session:
+            tasks = [self.link_keyword(keyword, lang, lemma if lemma is not None else keyword)
+                     for keyword, (lang, lemma) in keywords.items()]
+            links = dict(await asyncio.gather(*tasks))
+        return links
+
+    def run(self, keywords):
+        # Synchronous entry point for the main program
+        return asyncio.run(self.link_keywords(keywords))
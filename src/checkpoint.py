@@ -0,0 +1,129 @@
+import json
+import os
+import time
+import uuid
+
+
+def new_run_id():
+    # Sortable by start time and unique between runs started at the same second
+    return "{}-{}".format(time.strftime("%Y%m%dT%H%M%S"), uuid.uuid4().hex[:8])
+
+
+class CheckpointStore:
+    """ Append-only store of the processed keywords of every run.
+
+    Every processed keyword is a JSON line {"run", "keyword", "result"}
+    appended to the file, and the file is flushed to disk every flush_every
+    keywords, so a crashed or interrupted run loses at most the last ones.
+    Keywords that failed are written as {"run", "keyword", "error"} and have
+    no result, so they are processed again when the run is resumed.
+    A line cut by a crash is ignored when reading.
+
+    Parameters
+    ----------
+    path : str
+        JSON lines file of the store.
+    run_id : str, optional
+        Run the new keywords belong to. Defaults to a new run.
+    flush_every : int
+        Keywords written before flushing the file to disk.
+    """
+
+    def __init__(self, path, run_id=None, flush_every=100):
+        self.path = path
+        self.run_id = run_id or new_run_id()
+        self.flush_every = flush_every
+        self.pending = 0
+        self.file = None
+
+    @classmethod
+    def resume(cls, path, flush_every=100):
+        # Store that keeps adding keywords to the last run, or to a new one if there is none
+        store = cls(path, flush_every=flush_every)
+        store.run_id = store.last_run() or store.run_id
+        return store
+
+    def entries(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f_in:
+            for line in f_in:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line of a run that didn't finish writing it
+                    continue
+                yield entry
+
+    def runs(self):
+        # Run ids in the order they were first written
+        return list(dict.fromkeys(entry['run'] for entry in self.entries()))
+
+    def last_run(self):
+        runs = self.runs()
+        return runs[-1] if runs else None
+
+    def results(self, run_id=None):
+        """ Stored result of every keyword.
+
+        Parameters
+        ----------
+        run_id : str, optional
+            Only keywords of this run. By default keywords of every run.
+
+        Returns
+        -------
+        dict
+            Mapping keyword -> result, the latest one for keywords stored
+            several times.
+        """
+        return {entry['keyword']: entry['result'] for entry in self.entries()
+                if 'result' in entry and (run_id is None or entry['run'] == run_id)}
+
+    def failures(self, run_id=None):
+        # Mapping keyword -> error of the keywords whose latest entry is an error
+        latest = {entry['keyword']: entry for entry in self.entries() if run_id is None or entry['run'] == run_id}
+        return {keyword: entry['error'] for keyword, entry in latest.items() if 'error' in entry}
+
+    def open(self):
+        if self.file is None:
+            # Don't glue the first entry to a line cut by a crash
+            cut = False
+            if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                with open(self.path, 'rb') as f_in:
+                    f_in.seek(-1, os.SEEK_END)
+                    cut = f_in.read(1) != b'\n'
+            self.file = open(self.path, 'a', encoding='utf-8')
+            if cut:
+                self.file.write('\n')
+        return self.file
+
+    def add(self, keyword, result):
+        self.write({'run': self.run_id, 'keyword': keyword, 'result': result})
+
+    def add_failure(self, keyword, error):
+        self.write({'run': self.run_id, 'keyword': keyword, 'error': error})
+
+    def write(self, entry):
+        self.open().write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.pending += 1
+        if self.pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,128 @@
+""" Columnar file of the compacted keys, with loaders for it and for compacting_keys.csv.
+
+compacting_keys.csv stores the labels of every uri as the repr of a list,
+which has to be parsed with ast.literal_eval row by row. The Arrow IPC file
+keeps the same content in three columns, uri, keyword and language (the
+last two lists, one item per label), and can be loaded without parsing or
+memory-mapped and read in place by other processes.
+
+pyarrow is only imported by the Arrow paths, so reading compacting_keys.csv
+doesn't need it.
+"""
+import ast
+import csv
+import os
+from collections.abc import Mapping
+
+from records import CompactKeys, LabelList
+
+
+def schema():
+    # Columns of the Arrow file: the uri and the keyword and language of every label
+    import pyarrow as pa
+    return pa.schema([
+        ('uri', pa.string()),
+        ('keyword', pa.list_(pa.string())),
+        ('language', pa.list_(pa.string())),
+    ])
+
+
+def write_compacting_keys(com_keys, path="../files/compacting_keys.arrow"):
+    """ Write the compacted keys as an uncompressed Arrow IPC file.
+
+    Parameters
+    ----------
+    com_keys : mapping
+        Compacted labels by uri, as returned by CompactingKeys.finalize.
+    path : str
+        File to write. It's replaced only once completely written.
+    """
+    import pyarrow as pa
+    arrow_schema = schema()
+    uris, keywords, languages = [], [], []
+    for uri, labels in com_keys.items():
+        uris.append(uri)
+        keywords.append([label['keyword'] for label in labels])
+        languages.append([label['language'] for label in labels])
+    table = pa.Table.from_arrays([pa.array(uris, pa.string()), pa.array(keywords, arrow_schema.field('keyword').type),
+                                  pa.array(languages, arrow_schema.field('language').type)], schema=arrow_schema)
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, arrow_schema) as writer:
+            writer.write_table(table)
+    os.replace(path + '.tmp', path)
+
+
+def read_compacting_keys_csv(path="../files/compacting_keys.csv"):
+    # Compacted keys of compacting_keys.csv, parsing the repr of every label list
+    com_keys = CompactKeys()
+    with open(path, 'r', encoding='utf-8') as f_in:
+        reader = csv.reader(f_in)
+        next(reader, None)
+        for row in reader:
+            if len(row) > 1:
+                com_keys[row[0]] = ast.literal_eval(row[1])
+    return com_keys
+
+
+def read_compacting_keys(path="../files/compacting_keys.arrow"):
+    """ Load the compacted keys written by write_compacting_keys.
+
+    Files ending in .csv are read as compacting_keys.csv instead.
+
+    Returns
+    -------
+    CompactKeys
+        Mapping uri -> list of {'keyword', 'language'} labels.
+    """
+    if path.endswith('.csv'):
+        return read_compacting_keys_csv(path)
+    import pyarrow as pa
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    com_keys = CompactKeys()
+    for uri, keywords, languages in zip(table.column('uri').to_pylist(), table.column('keyword').to_pylist(),
+                                        table.column('language').to_pylist()):
+        com_keys[uri] = LabelList({'keyword': keyword, 'language': language}
+                                  for keyword, language in zip(keywords, languages))
+    return com_keys
+
+
+class MappedCompactKeys(Mapping):
+    """ Compacted keys read in place from a memory-mapped Arrow IPC file.
+
+    Only the uri column is read when opening, to index the rows; the labels
+    of a uri are read from the mapped file when it's looked up.
+
+    Parameters
+    ----------
+    path : str
+        File written by write_compacting_keys.
+    """
+
+    def __init__(self, path="../files/compacting_keys.arrow"):
+        import pyarrow as pa
+        self.source = pa.memory_map(path)
+        self.table = pa.ipc.open_file(self.source).read_all()
+        self.rows = {uri: i for i, uri in enumerate(self.table.column('uri').to_pylist())}
+
+    def __getitem__(self, uri):
+        i = self.rows[uri]
+        keywords = self.table.column('keyword')[i].as_py()
+        languages = self.table.column('language')[i].as_py()
+        return [{'keyword': keyword, 'language': language} for keyword, language in zip(keywords, languages)]
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def close(self):
+        self.table = None
+        self.source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
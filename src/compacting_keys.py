@@ -1,23 +1,32 @@
+import os
 import sys
-import time
 import traceback
 
-from SPARQLWrapper import SPARQLWrapper, JSON
+import http_client
 from tfg_nlp import normalize
 from requests import HTTPError, Timeout
+from requests.utils import default_user_agent
 
+# SPARQL endpoints, can be overridden to point to another server (e.g. fake_endpoints)
+WIKIDATA_SPARQL = os.environ.get('WIKIDATA_SPARQL', "https://query.wikidata.org/sparql")
+DBPEDIA_SPARQL = os.environ.get('DBPEDIA_SPARQL', "http://dbpedia.org/sparql")
 
-def wait_retry_after(response):
-    if 'retry-after' in response.info().keys():
-        print('Continuing after {}...'.format(response.info()['retry-after']))
-        time.sleep(response.info()['retry-after'])
+
+def sparql_select(endpoint, query, user_agent, method='GET'):
+    # Run a SELECT query through the pooled session of the endpoint, retrying throttled requests
+    params = {'query': query, 'format': 'json'}
+    headers = {'User-Agent': user_agent, 'Accept': 'application/sparql-results+json'}
+    if method == 'POST':
+        response = http_client.post(endpoint, data=params, headers=headers)
+    else:
+        response = http_client.get(endpoint, params=params, headers=headers)
+    return response.json()
 
 
 def Wikidata_wrapper(url):
-    user_agent = 'Wikidata (marcmasipc@hotmail.com) SPARQLWrapper/1.8.5'
+    user_agent = 'Wikidata (marcmasipc@hotmail.com) ' + default_user_agent()
     try:
-        sparql = SPARQLWrapper("https://query.wikidata.org/sparql", agent=user_agent)
-        sparql.setQuery(
+        query = (
             """SELECT DISTINCT (LANG(?name) AS ?lang) ?name (BOUND(?type) AS ?isArticle)
             WHERE {{
               BIND(<{url}>AS ?uri)
@@ -28,12 +37,7 @@ def Wikidata_wrapper(url):
                 ?type wdt:P279* wd:Q732577 . # publication
               }}
             }}""".format(url=url))
-        sparql.setReturnFormat(JSON)
-        sparql.setTimeout(20)
-
-        response = sparql.query()
-        wait_retry_after(response)
-        results = response.convert()
+        results = sparql_select(WIKIDATA_SPARQL, query, user_agent)
 
         ent_list = []
         for result in results["results"]["bindings"]:
@@ -53,10 +57,9 @@ def Wikidata_wrapper(url):
 
 
 def DBpedia_wrapper(url):
-    user_agent = 'DBpediaExtractor (marcmasipc@hotmail.com) SPARQLWrapper/1.8.5'
+    user_agent = 'DBpediaExtractor (marcmasipc@hotmail.com) ' + default_user_agent()
     try:
-        sparql = SPARQLWrapper("http://dbpedia.org/sparql", agent=user_agent)
-        sparql.setQuery("""
+        query = ("""
             PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
             SELECT DISTINCT (LANG(?name) AS ?lang) ?name (BOUND(?type) AS ?isArticle)
             WHERE {{
@@ -69,12 +72,7 @@ def DBpedia_wrapper(url):
                 }}
             }}          
         """.format(url=url))
-        sparql.setReturnFormat(JSON)
-        sparql.setTimeout(20)
-
-        response = sparql.query()
-        wait_retry_after(response)
-        results = response.convert()
+        results = sparql_select(DBPEDIA_SPARQL, query, user_agent)
 
         ent_list = []
         for result in results["results"]["bindings"]:
@@ -90,3 +88,102 @@ def DBpedia_wrapper(url):
     except Exception as ex:
         traceback.print_exc(file=sys.stdout)
         raise ex
+
+
+# -------------- Batched label fetchers --------------
+WIKIDATA_BATCH_QUERY = """
+    SELECT DISTINCT ?uri (LANG(?name) AS ?lang) ?name (BOUND(?type) AS ?isArticle)
+    WHERE {{
+      VALUES ?uri {{ {uris} }}
+      ?uri rdfs:label ?name .
+      FILTER(LANG(?name) IN ('en', 'es', 'ca'))
+      OPTIONAL {{
+        ?uri wdt:P31 ?type .
+        ?type wdt:P279* wd:Q732577 . # publication
+      }}
+    }}"""
+
+DBPEDIA_BATCH_QUERY = """
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    SELECT DISTINCT ?uri (LANG(?name) AS ?lang) ?name (BOUND(?type) AS ?isArticle)
+    WHERE {{
+        VALUES ?uri {{ {uris} }}
+        ?uri rdfs:label ?name .
+        FILTER(LANG(?name) IN ('en', 'es', 'ca'))
+        OPTIONAL {{
+            ?uri rdfs:Resource ?type .
+            ?type rdfs:subClassOf <https://dbpedia.org/ontology/publication> . # publication
+        }}
+    }}"""
+
+
+def batch_labels(endpoint, query, not_article, user_agent, urls, chunk_size):
+    labels = {}
+    urls = list(dict.fromkeys(urls))
+    for i in range(0, len(urls), chunk_size):
+        labels.update(chunk_labels(endpoint, query, not_article, user_agent, urls[i:i + chunk_size]))
+    return labels
+
+
+def chunk_labels(endpoint, query, not_article, user_agent, chunk):
+    values = " ".join("<{}>".format(url) for url in chunk)
+    try:
+        results = sparql_select(endpoint, query.format(uris=values), user_agent, method='POST')
+    except HTTPError as ex:
+        # Only a malformed query (400) is caused by the URIs, other errors left after the retries are raised
+        if ex.response is None or ex.response.status_code != 400:
+            raise
+        # A single malformed URI breaks the whole query, so look for it splitting the chunk
+        if len(chunk) == 1:
+            traceback.print_exc(file=sys.stdout)
+            print("Labels of {} can't be queried, skipped".format(chunk[0]))
+            return {chunk[0]: []}
+        half = len(chunk) // 2
+        labels = chunk_labels(endpoint, query, not_article, user_agent, chunk[:half])
+        labels.update(chunk_labels(endpoint, query, not_article, user_agent, chunk[half:]))
+        return labels
+
+    labels = {url: [] for url in chunk}
+    for result in results["results"]["bindings"]:
+        if result["isArticle"]["value"] == not_article:
+            keywords = normalize(result["name"]["value"])
+            labels[result["uri"]["value"]].append({'keyword': keywords, 'language': result["lang"]["value"]})
+    return labels
+
+
+def Wikidata_batch_wrapper(urls, chunk_size=200):
+    """ Labels of many Wikidata URIs, querying them together with VALUES.
+
+    Parameters
+    ----------
+    urls : iterable of str
+        Wikidata URIs.
+    chunk_size : int
+        URIs sent in every query.
+
+    Returns
+    -------
+    dict
+        Mapping URI -> list of {'keyword', 'language'}, as Wikidata_wrapper.
+    """
+    user_agent = 'Wikidata (marcmasipc@hotmail.com) ' + default_user_agent()
+    return batch_labels(WIKIDATA_SPARQL, WIKIDATA_BATCH_QUERY, "false", user_agent, urls, chunk_size)
+
+
+def DBpedia_batch_wrapper(urls, chunk_size=200):
+    """ Labels of many DBpedia URIs, querying them together with VALUES.
+
+    Parameters
+    ----------
+    urls : iterable of str
+        DBpedia URIs.
+    chunk_size : int
+        URIs sent in every query.
+
+    Returns
+    -------
+    dict
+        Mapping URI -> list of {'keyword', 'language'}, as DBpedia_wrapper.
+    """
+    user_agent = 'DBpediaExtractor (marcmasipc@hotmail.com) ' + default_user_agent()
+    return batch_labels(DBPEDIA_SPARQL, DBPEDIA_BATCH_QUERY, "0", user_agent, urls, chunk_size)
@@ -0,0 +1,57 @@
+import sys
+
+from records import CompactKeys, LabelList
+
+
+class CompactingKeys:
+    """ Labels of every uri, compacted as the keywords arrive.
+
+    Every keyword is added under the uri it was linked to, followed the
+    first time the uri is seen by its labels in other languages. Repeated
+    (keyword, language) labels of a uri are skipped with a hash lookup, and
+    uris left with a single label are pruned once, in finalize.
+
+    Parameters
+    ----------
+    fetch : callable, optional
+        Function uri -> list of {'keyword', 'language'} labels, e.g. a lookup
+        in the labels fetched by tfg_nlp.fetch_labels. Called once per uri.
+    """
+
+    def __init__(self, fetch=None):
+        self.fetch = fetch
+        # uri -> insertion ordered set of (keyword, language)
+        self.labels = {}
+
+    def add(self, keyword, language, uri):
+        if uri is None:
+            return
+        new = uri not in self.labels
+        labels = self.labels.setdefault(uri, {})
+        labels.setdefault((keyword, sys.intern(language)))
+        if new and self.fetch is not None:
+            for label in self.fetch(uri):
+                labels.setdefault((label['keyword'], sys.intern(label['language'])))
+
+    def add_result(self, keyword, result):
+        # Wikidata uri of a process() result, or its DBpedia uri when it has none
+        uri = result['Wikidata'] if result['Wikidata'] else result['DBpedia']
+        self.add(keyword, result['lang'], uri)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def finalize(self):
+        """ Compacted keys, as written to compacting_keys.csv.
+
+        Returns
+        -------
+        CompactKeys
+            Mapping uri -> list of {'keyword', 'language'} labels, only for
+            uris with more than one label.
+        """
+        compacted = CompactKeys()
+        for uri, labels in self.labels.items():
+            if len(labels) > 1:
+                compacted[uri] = LabelList.from_pairs(labels)
+        return compacted
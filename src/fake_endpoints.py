@@ -0,0 +1,256 @@
+""" Local stand-in server for the Wikidata, DBpedia Spotlight and SPARQL endpoints.
+
+It answers with the same JSON shapes as the public services, built from a
+fixtures file, so the linkers and label wrappers can be load-tested and
+benchmarked without calling them. Point the pipeline at it with:
+
+    WIKIDATA_BASE=http://127.0.0.1:8000/w
+    DBPEDIA_SPOTLIGHT_BASE=http://127.0.0.1:8000/en
+    WIKIDATA_SPARQL=http://127.0.0.1:8000/sparql
+    DBPEDIA_SPARQL=http://127.0.0.1:8000/sparql
+
+The fixtures file is a JSON object with three sections:
+
+    {
+      "wbsearchentities": {"<search>": [<wbsearchentities result>, ...]},
+      "annotate": {"<surface form>": "<DBpedia URI>"},
+      "sparql": {"<URI>": [{"lang": "en", "name": "<label>", "isArticle": "false"}, ...]}
+    }
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# URIs bound to ?uri in a query, either with BIND(<uri> AS ?uri) or VALUES ?uri { <uri> ... }
+SPARQL_BIND = re.compile(r"BIND\s*\(\s*<([^>]*)>\s*AS\s+\?uri\s*\)", re.IGNORECASE)
+SPARQL_VALUES = re.compile(r"VALUES\s+\?uri\s*\{([^}]*)\}", re.IGNORECASE)
+SPARQL_URI = re.compile(r"<([^>]*)>")
+# Characters not allowed inside an IRI, a query using them is malformed
+SPARQL_INVALID_IRI = re.compile(r'[\s"{}|\\^`]')
+
+
+def load_fixtures(path):
+    with open(path, 'r', encoding='utf-8') as f_in:
+        fixtures = json.load(f_in)
+    for section in ('wbsearchentities', 'annotate', 'sparql'):
+        fixtures.setdefault(section, {})
+    return fixtures
+
+
+def search_entities(fixtures, search):
+    results = fixtures['wbsearchentities'].get(search)
+    if results is None:
+        results = fixtures['wbsearchentities'].get(search.lower(), [])
+    return {'searchinfo': {'search': search}, 'search': results, 'success': 1}
+
+
+def annotate(fixtures, text):
+    # Spot every known surface form in the text, longest forms first and without overlaps
+    resources = []
+    taken = set()
+    lower = text.lower()
+    for surface in sorted(fixtures['annotate'], key=len, reverse=True):
+        pattern = r"(?<!\w)" + re.escape(surface.lower()) + r"(?!\w)"
+        for match in re.finditer(pattern, lower):
+            span = set(range(match.start(), match.end()))
+            if span & taken:
+                continue
+            taken |= span
+            resources.append({
+                '@URI': fixtures['annotate'][surface],
+                '@support': '100',
+                '@types': '',
+                '@surfaceForm': text[match.start():match.end()],
+                '@offset': str(match.start()),
+                '@similarityScore': '0.99',
+                '@percentageOfSecondRank': '0.01'
+            })
+    resources.sort(key=lambda resource: int(resource['@offset']))
+
+    response = {'@text': text, '@confidence': '0.5', '@support': '0', '@types': '',
+                '@sparql': '', '@policy': 'whitelist'}
+    if resources:
+        response['Resources'] = resources
+    return response
+
+
+def sparql_uris(query):
+    uris = SPARQL_BIND.findall(query)
+    for values in SPARQL_VALUES.findall(query):
+        uris.extend(SPARQL_URI.findall(values))
+    return uris
+
+
+def sparql_select(fixtures, query):
+    bindings = []
+    for uri in sparql_uris(query):
+        for label in fixtures['sparql'].get(uri, []):
+            bindings.append({
+                'uri': {'type': 'uri', 'value': uri},
+                'lang': {'type': 'literal', 'value': label['lang']},
+                'name': {'type': 'literal', 'xml:lang': label['lang'], 'value': label['name']},
+                'isArticle': {'type': 'literal', 'datatype': 'http://www.w3.org/2001/XMLSchema#boolean',
+                              'value': label['isArticle']}
+            })
+    return {'head': {'vars': ['uri', 'lang', 'name', 'isArticle']}, 'results': {'bindings': bindings}}
+
+
+class FakeEndpointsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.answer(parse_qs(urlparse(self.path).query))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8')
+        params = parse_qs(urlparse(self.path).query)
+        params.update(parse_qs(body))
+        self.answer(params)
+
+    def answer(self, params):
+        server = self.server.endpoints
+        path = urlparse(self.path).path
+        param = lambda name: params.get(name, [''])[0]
+
+        if path.endswith('/api.php') and param('action') == 'wbsearchentities':
+            endpoint = 'wbsearchentities'
+            build = lambda: search_entities(server.fixtures, param('search'))
+            content_type = 'application/json'
+        elif path.endswith('/annotate'):
+            endpoint = 'annotate'
+            build = lambda: annotate(server.fixtures, param('text'))
+            content_type = 'application/json'
+        elif path.endswith('/sparql'):
+            endpoint = 'sparql'
+            build = lambda: sparql_select(server.fixtures, param('query'))
+            content_type = 'application/sparql-results+json'
+        else:
+            self.send_error(404)
+            return
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if endpoint == 'sparql' and any(SPARQL_INVALID_IRI.search(uri) for uri in sparql_uris(param('query'))):
+            self.send_error(400, "Malformed query")
+            return
+
+        if server.throttled(endpoint):
+            self.send_response(server.throttle_status)
+            if server.retry_after is not None:
+                self.send_header('Retry-After', str(server.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        content = json.dumps(build(), ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeEndpoints:
+    """ Fake Wikidata, DBpedia Spotlight and SPARQL server running in a thread.
+
+    Parameters
+    ----------
+    fixtures : str or dict
+        Fixtures file or its already loaded content.
+    host, port : str, int
+        Address to listen on. Port 0 picks a free port.
+    latency : float
+        Seconds waited before answering every request.
+    throttle_rate : float
+        Probability (0-1) of answering a request with throttle_status.
+    throttle_first : int
+        Number of first requests of each endpoint answered with throttle_status.
+    throttle_status : int
+        Status code of throttled requests (403 or 429).
+    retry_after : int, optional
+        Value of the Retry-After header sent with throttled requests.
+    seed : int, optional
+        Seed of the random throttling.
+    """
+
+    def __init__(self, fixtures, host='127.0.0.1', port=0, latency=0.0, throttle_rate=0.0,
+                 throttle_first=0, throttle_status=429, retry_after=None, seed=None):
+        self.fixtures = load_fixtures(fixtures) if isinstance(fixtures, str) else fixtures
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.throttle_first = throttle_first
+        self.throttle_status = throttle_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.throttled_requests = Counter()
+        self.lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), FakeEndpointsHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.request_queue_size = 1024
+        self.httpd.endpoints = self
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def throttled(self, endpoint):
+        with self.lock:
+            self.requests[endpoint] += 1
+            throttle = self.requests[endpoint] <= self.throttle_first or \
+                self.random.random() < self.throttle_rate
+            if throttle:
+                self.throttled_requests[endpoint] += 1
+            return throttle
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Wikidata, DBpedia Spotlight and SPARQL endpoints")
+    parser.add_argument('fixtures', help="JSON fixtures file")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before every answer")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="probability of throttling a request")
+    parser.add_argument('--throttle-first', type=int, default=0, help="throttle the first N requests")
+    parser.add_argument('--throttle-status', type=int, default=429, choices=[403, 429])
+    parser.add_argument('--retry-after', type=int, default=None, help="Retry-After seconds of throttled requests")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeEndpoints(args.fixtures, args.host, args.port, args.latency, args.throttle_rate,
+                           args.throttle_first, args.throttle_status, args.retry_after, args.seed)
+    print("Serving fake endpoints on {}".format(server.url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
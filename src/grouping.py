@@ -0,0 +1,117 @@
+import json
+import os
+from collections import defaultdict
+from functools import lru_cache
+
+from nltk.stem import SnowballStemmer
+
+# Snowball stemmers available for the languages of the keywords (catalan uses its lemma)
+STEMMER_LANGUAGES = {
+    'en': 'english',
+    'es': 'spanish'
+}
+
+
+@lru_cache(maxsize=None)
+def get_stemmer(lang):
+    # Build the stemmer of a language only once per process
+    return SnowballStemmer(STEMMER_LANGUAGES[lang])
+
+
+def keyword_root(keyword, lang, lemma=None):
+    # Stem every word of the keyword, or use its lemma when there is no stemmer
+    if lang in STEMMER_LANGUAGES:
+        stemmer = get_stemmer(lang)
+        return " ".join([stemmer.stem(word) for word in keyword.split()])
+    return lemma if lemma is not None else keyword
+
+
+class GroupIndex:
+    """ Corpus-wide index of keywords grouped by their root.
+
+    The index keeps, for every language, the keywords that share the
+    same root (stem or lemma), so that morphological variants of a
+    keyword can be collapsed before linking them.
+    """
+
+    def __init__(self, groups=None):
+        # language -> root -> keywords
+        self.groups = defaultdict(dict)
+        # keyword -> (language, root)
+        self.roots = {}
+        for lang, roots in (groups or {}).items():
+            for root, keywords in roots.items():
+                self.groups[lang][root] = list(keywords)
+                for keyword in keywords:
+                    self.roots[keyword] = (lang, root)
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __contains__(self, keyword):
+        return keyword in self.roots
+
+    def add(self, keywords, languages, lemmas=None):
+        """ Index a batch of keywords in one pass.
+
+        Parameters
+        ----------
+        keywords : list of str
+            Normalized keywords. Keywords already indexed are skipped.
+        languages : list of str
+            Language of each keyword (en, es, ca).
+        lemmas : dict, optional
+            Mapping keyword -> lemma, used for languages without stemmer.
+        """
+        lemmas = lemmas or {}
+        for keyword, lang in zip(keywords, languages):
+            if keyword in self.roots:
+                continue
+            root = keyword_root(keyword, lang, lemmas.get(keyword))
+            self.groups[lang].setdefault(root, []).append(keyword)
+            self.roots[keyword] = (lang, root)
+        return self
+
+    def group(self, keyword):
+        # Keywords sharing the root of the given keyword
+        lang, root = self.roots[keyword]
+        return self.groups[lang][root]
+
+    def representatives(self, keywords):
+        """ Pick one keyword of each group among the given ones.
+
+        Parameters
+        ----------
+        keywords : iterable of str
+            Keywords of the current run.
+
+        Returns
+        -------
+        dict
+            Mapping keyword -> representative keyword of its group. The
+            representative is the first keyword of the group in the index
+            that belongs to the given keywords.
+        """
+        current = set(keywords)
+        representative = {}
+        for keyword in current:
+            if keyword not in self.roots:
+                representative[keyword] = keyword
+                continue
+            for candidate in self.group(keyword):
+                if candidate in current:
+                    representative[keyword] = candidate
+                    break
+        return representative
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f_out:
+            json.dump(self.groups, f_out, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        # Reuse the index of a previous run, or start an empty one
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as f_in:
+            return cls(json.load(f_in))
@@ -0,0 +1,131 @@
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Seconds to wait for every request
+DEFAULT_TIMEOUT = 20
+
+logger = logging.getLogger(__name__)
+
+# Sessions opened by this process, by endpoint
+sessions = {}
+
+
+def retry_after_seconds(value, default):
+    # Seconds to wait from a Retry-After header, given in seconds or as an HTTP date
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RetryPolicy:
+    """ Exponential backoff with jitter and a maximum number of retries.
+
+    Parameters
+    ----------
+    max_retries : int
+        Retries of a request before giving up.
+    backoff_factor : float
+        Seconds waited before the first retry, doubled on every retry.
+    max_backoff : float
+        Maximum seconds waited between two retries.
+    jitter : float
+        Random fraction added to every wait, so workers don't retry at once.
+    retry_statuses : tuple of int
+        Status codes that are retried (throttling and server errors).
+    """
+
+    def __init__(self, max_retries=5, backoff_factor=1.0, max_backoff=60.0, jitter=0.5,
+                 retry_statuses=(403, 429, 500, 502, 503, 504)):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+
+    def delay(self, attempt, retry_after=None):
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        backoff *= 1 + random.uniform(0, self.jitter)
+        # The server knows better when it is ready again
+        return retry_after_seconds(retry_after, backoff)
+
+
+def endpoint_of(url):
+    parts = urlparse(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(endpoint, pool_maxsize=10):
+    # One keep-alive session per endpoint and per process
+    key = (os.getpid(), endpoint)
+    if key not in sessions:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        sessions[key] = session
+    return sessions[key]
+
+
+def request(method, url, policy=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    """ Send a request through the pooled session of its endpoint.
+
+    Throttled answers, server errors and connection errors are retried
+    following the retry policy.
+
+    Returns
+    -------
+    requests.Response
+
+    Raises
+    ------
+    requests.HTTPError
+        If the answer is still an error after the last retry.
+    requests.ConnectionError, requests.Timeout
+        If the endpoint can't be reached after the last retry.
+    """
+    policy = policy or RetryPolicy()
+    endpoint = endpoint_of(url)
+    session = get_session(endpoint)
+
+    for attempt in range(policy.max_retries + 1):
+        last = attempt == policy.max_retries
+        try:
+            res = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if last:
+                raise
+            delay = policy.delay(attempt)
+            logger.warning("%s unreachable (%s). Retrying in %.1f seconds...", endpoint, e, delay)
+            time.sleep(delay)
+            continue
+
+        if res.status_code in policy.retry_statuses and not last:
+            delay = policy.delay(attempt, res.headers.get('Retry-After'))
+            logger.warning("%s answered %d. Retrying in %.1f seconds...", endpoint, res.status_code, delay)
+            time.sleep(delay)
+            continue
+
+        res.raise_for_status()
+        return res
+
+
+def get(url, params=None, policy=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return request('GET', url, policy=policy, timeout=timeout, params=params, **kwargs)
+
+
+def post(url, data=None, policy=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return request('POST', url, policy=policy, timeout=timeout, data=data, **kwargs)
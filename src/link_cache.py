@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by LinkCache.get when there is no valid entry, since None is a cached negative result
+MISSING = object()
+
+
+class LinkCache:
+    """ Persistent cache of linked entities shared by several processes.
+
+    Links are stored in a SQLite database keyed by (endpoint, label, language).
+    Labels that could not be linked are cached too (negative results), with
+    their own time to live.
+
+    Parameters
+    ----------
+    path : str
+        File of the SQLite database.
+    ttl : int
+        Seconds a linked URI stays valid.
+    negative_ttl : int
+        Seconds a label without URI stays valid.
+    """
+
+    def __init__(self, path, ttl=30 * 24 * 3600, negative_ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # One connection per thread, since a SQLite connection can only be used by the thread that opened it
+        self._local = threading.local()
+
+    def __getstate__(self):
+        # Connections can't be shared between processes, every process opens its own
+        state = self.__dict__.copy()
+        del state['_local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        local = self._local
+        if getattr(local, 'connection', None) is None or local.pid != os.getpid():
+            local.connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            local.connection.execute("PRAGMA journal_mode=WAL")
+            local.connection.execute(
+                """CREATE TABLE IF NOT EXISTS links (
+                    endpoint TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    uri TEXT,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (endpoint, label, language)
+                )""")
+            local.pid = os.getpid()
+        return local.connection
+
+    def get(self, endpoint, label, language=''):
+        """ Cached URI of a label.
+
+        Returns
+        -------
+        str, None or MISSING
+            The URI, None if the label is known to have no URI, or MISSING
+            if the label is not cached or its entry has expired.
+        """
+        row = self.connection.execute(
+            "SELECT uri, created FROM links WHERE endpoint = ? AND label = ? AND language = ?",
+            (endpoint, label, language)).fetchone()
+        if row is None:
+            return MISSING
+
+        uri, created = row
+        ttl = self.ttl if uri is not None else self.negative_ttl
+        if time.time() - created > ttl:
+            return MISSING
+        return uri
+
+    def set(self, endpoint, label, language, uri):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO links (endpoint, label, language, uri, created) VALUES (?, ?, ?, ?, ?)",
+            (endpoint, label, language, uri, time.time()))
+
+    def purge(self):
+        # Delete the expired entries
+        now = time.time()
+        self.connection.execute(
+            "DELETE FROM links WHERE (uri IS NOT NULL AND created < ?) OR (uri IS NULL AND created < ?)",
+            (now - self.ttl, now - self.negative_ttl))
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+
+    def close(self):
+        # Connection of the calling thread, the ones of other threads are closed with them
+        if getattr(self._local, 'connection', None) is not None and self._local.pid == os.getpid():
+            self._local.connection.close()
+        self._local.connection = None
+
+
+def entry_size(key, value):
+    # Approximate bytes taken by an entry: the key tuple, its items and the value
+    size = sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(key, tuple):
+        size += sum(sys.getsizeof(item) for item in key)
+    return size
+
+
+class LRUCache:
+    """ In-memory cache of links bounded by number of entries and memory.
+
+    The least recently used entries are evicted first. Labels that could not
+    be linked are stored as None, so get returns MISSING for unknown labels.
+
+    Parameters
+    ----------
+    max_entries : int, optional
+        Maximum number of entries, None for no limit.
+    max_bytes : int, optional
+        Maximum approximate memory taken by the entries, None for no limit.
+    """
+
+    def __init__(self, max_entries=100000, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Linkers running in threads share the cache
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can't be sent to other processes, every process creates its own
+        state = self.__dict__.copy()
+        del state['lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            try:
+                value = self.entries[key]
+            except KeyError:
+                self.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            if key in self.entries:
+                self.size -= entry_size(key, self.entries.pop(key))
+            self.entries[key] = value
+            self.size += entry_size(key, value)
+
+            while self.entries and ((self.max_entries is not None and len(self.entries) > self.max_entries) or
+                                    (self.max_bytes is not None and self.size > self.max_bytes)):
+                old_key, old_value = self.entries.popitem(last=False)
+                self.size -= entry_size(old_key, old_value)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'bytes': self.size, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
@@ -1,55 +1,122 @@
 import json
 import logging
+import os
+from bisect import bisect_right
 from functools import reduce
-from webbrowser import Error
 
-import requests
 import time
 
+from joblib import Parallel, delayed
 from sklearn.base import TransformerMixin, BaseEstimator
 
-WIKIDATA_BASE = "https://www.wikidata.org/w"
-DBPEDIA_BASE = 'http://dbpedia.org'
-DBPEDIA_SPOTLIGHT_BASE = 'http://api.dbpedia-spotlight.org/en'
+import http_client
+from http_client import RetryPolicy
+from link_cache import LRUCache, MISSING
+
+# Base URLs can be overridden to point the linkers to another server (e.g. fake_endpoints)
+WIKIDATA_BASE = os.environ.get('WIKIDATA_BASE', "https://www.wikidata.org/w")
+DBPEDIA_BASE = os.environ.get('DBPEDIA_BASE', 'http://dbpedia.org')
+DBPEDIA_SPOTLIGHT_BASE = os.environ.get('DBPEDIA_SPOTLIGHT_BASE', 'http://api.dbpedia-spotlight.org/en')
 DBPEDIA_SPOTLIGHT_MAX_CHARS = 15000
+# Put between the keywords of a batch, so no mention spans two keywords
+DBPEDIA_SPOTLIGHT_SEPARATOR = "\n.\n"
 OWL_SAME_AS = 'http://www.w3.org/2002/07/owl#sameAs'
 
 logger = logging.getLogger(__name__)
 
 
-class DBPediaEntityLinker(BaseEstimator, TransformerMixin):
+def parallel_links(link, inputs, n_jobs=None, backend='threading'):
+    """ Link every distinct input once, spread across n_jobs workers.
+
+    Parameters
+    ----------
+    link : callable
+        Function linking one input (e.g. a bound link_entities).
+    inputs : iterable
+        Inputs to be linked, tuples are passed as several arguments.
+        Repeated inputs are linked only once.
+    n_jobs : int, optional
+        Number of workers, None or 1 to link sequentially and -1 to use all the CPUs.
+    backend : str
+        joblib backend: 'threading' (linking is I/O bound), 'loky' or 'multiprocessing'.
+
+    Returns
+    -------
+    dict
+        Mapping input -> link.
+    """
+    unique = list(dict.fromkeys(inputs))
+    if n_jobs is None or n_jobs == 1:
+        return {x: link(*x) if isinstance(x, tuple) else link(x) for x in unique}
+
+    calls = (delayed(link)(*x) if isinstance(x, tuple) else delayed(link)(x) for x in unique)
+    return dict(zip(unique, Parallel(n_jobs=n_jobs, backend=backend)(calls)))
+
+
+class CachedLinker:
+    # Links are looked up in the in-memory LRU cache first, then in the persistent cache
+
+    def cached_link(self, endpoint, label, language=''):
+        key = (endpoint, label, language)
+        uri = self.memory_cache.get(key)
+        if uri is MISSING and self.cache is not None:
+            uri = self.cache.get(endpoint, label, language)
+            if uri is not MISSING:
+                self.memory_cache.set(key, uri)
+        return uri
+
+    def store_link(self, endpoint, label, language, uri):
+        self.memory_cache.set((endpoint, label, language), uri)
+        if self.cache is not None:
+            self.cache.set(endpoint, label, language, uri)
+
+
+class DBPediaEntityLinker(CachedLinker, BaseEstimator, TransformerMixin):
     """
 
     """
 
-    def __init__(self, confidence_threshold=0.4, throttling_time=5):
+    def __init__(self, confidence_threshold=0.4, throttling_time=5, cache=None, max_retries=5,
+                 timeout=http_client.DEFAULT_TIMEOUT, memory_cache=None, n_jobs=None, backend='threading'):
         self.confidence = confidence_threshold
         self.throttling_time = throttling_time
+        self.cache = cache
+        self.memory_cache = memory_cache if memory_cache is not None else LRUCache()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.n_jobs = n_jobs
+        self.backend = backend
 
     def fit(self, X, y=None):
         return self
 
     def transform(self, X, *args, **kwargs):
-        return [self.link_entities(text[:DBPEDIA_SPOTLIGHT_MAX_CHARS])
-                for text in X]
+        """ URI of the first resource of every text, or None.
+
+        Repeated texts are annotated once, with n_jobs parallel requests.
+        """
+        texts = [text[:DBPEDIA_SPOTLIGHT_MAX_CHARS] for text in X]
+        links = parallel_links(self.link_entities, texts, self.n_jobs, self.backend)
+        # Workers in other processes fill their own copy of the cache
+        for text, uri in links.items():
+            self.memory_cache.set((DBPEDIA_SPOTLIGHT_BASE, text, ''), uri)
+        return [links[text] for text in texts]
 
     def link_entities(self, text):
         """
         """
+        uri = self.cached_link(DBPEDIA_SPOTLIGHT_BASE, text)
+        if uri is not MISSING:
+            return uri
+
         payload = {'text': text}
-        reqheaders = {'accept': 'application/json'}
-        res = requests.get(f"{DBPEDIA_SPOTLIGHT_BASE}/annotate",
-                           params=payload,
-                           headers={"accept": "application/json"})
-        while res.status_code == 403:
-            logger.warn("DBPedia spotlight limit reached. Retrying in %d seconds...",
-                        self.throttling_time)
-            time.sleep(self.throttling_time)
-            res = requests.get(f"{DBPEDIA_SPOTLIGHT_BASE}/annotate",
-                               params=payload,
-                               headers={"accept": "application/json"})
-
-            print(res)
+        # Throttled requests are retried after throttling_time, doubling the wait every time
+        policy = RetryPolicy(max_retries=self.max_retries, backoff_factor=self.throttling_time)
+        res = http_client.get(f"{DBPEDIA_SPOTLIGHT_BASE}/annotate",
+                              params=payload,
+                              headers={"accept": "application/json"},
+                              policy=policy,
+                              timeout=self.timeout)
 
         try:
             res_dict = json.loads(res.content)
@@ -57,14 +124,98 @@ class DBPediaEntityLinker(BaseEstimator, TransformerMixin):
             print("Decoding JSON has failed")
             return None
 
-        if 'Resources' not in res_dict:
+        uri = None
+        if res_dict.get('Resources'):
+            uri = res_dict['Resources'][0]['@URI']
+
+        self.store_link(DBPEDIA_SPOTLIGHT_BASE, text, '', uri)
+        return uri
+
+    def pack(self, keywords):
+        # Group the keywords in texts of at most DBPEDIA_SPOTLIGHT_MAX_CHARS characters
+        batch, length = [], 0
+        for keyword in keywords:
+            extra = len(keyword) + (len(DBPEDIA_SPOTLIGHT_SEPARATOR) if batch else 0)
+            if batch and length + extra > DBPEDIA_SPOTLIGHT_MAX_CHARS:
+                yield batch
+                batch, length = [], 0
+                extra = len(keyword)
+            batch.append(keyword)
+            length += extra
+        if batch:
+            yield batch
+
+    def annotate_batch(self, keywords):
+        # Annotate the keywords in a single request and map every resource to its keyword by offset
+        # A single keyword longer than the limit is cut, as in transform
+        text = DBPEDIA_SPOTLIGHT_SEPARATOR.join(keywords)[:DBPEDIA_SPOTLIGHT_MAX_CHARS]
+        starts = []
+        position = 0
+        for keyword in keywords:
+            starts.append(position)
+            position += len(keyword) + len(DBPEDIA_SPOTLIGHT_SEPARATOR)
+
+        policy = RetryPolicy(max_retries=self.max_retries, backoff_factor=self.throttling_time)
+        res = http_client.post(f"{DBPEDIA_SPOTLIGHT_BASE}/annotate",
+                               data={'text': text},
+                               headers={"accept": "application/json"},
+                               policy=policy,
+                               timeout=self.timeout)
+        try:
+            res_dict = json.loads(res.content)
+        except Exception:
+            print("Decoding JSON has failed")
             return None
 
-        for resource in res_dict['Resources']:
-            return resource['@URI']
+        links = {}
+        resources = sorted(res_dict.get('Resources', []), key=lambda resource: int(resource['@offset']))
+        for resource in resources:
+            offset = int(resource['@offset'])
+            index = bisect_right(starts, offset) - 1
+            keyword = keywords[index]
+            # The first resource of a keyword is its link, as in link_entities
+            if offset < starts[index] + len(keyword) and keyword not in links:
+                links[keyword] = resource['@URI']
+        return links
+
+    def link_entities_batch(self, keywords):
+        """ Link many short texts with few Spotlight requests.
+
+        The keywords are packed, one per line, in texts up to
+        DBPEDIA_SPOTLIGHT_MAX_CHARS characters, and every returned resource
+        is mapped back to its keyword through its @offset. Keywords are
+        annotated next to other keywords, so Spotlight may disambiguate
+        them slightly differently than when they are sent alone.
+
+        Parameters
+        ----------
+        keywords : iterable of str
+            Texts to be linked.
+
+        Returns
+        -------
+        dict
+            Mapping keyword -> URI of its first resource, or None.
+        """
+        links = {}
+        pending = []
+        for keyword in dict.fromkeys(keywords):
+            uri = self.cached_link(DBPEDIA_SPOTLIGHT_BASE, keyword)
+            if uri is MISSING:
+                pending.append(keyword)
+            else:
+                links[keyword] = uri
 
+        for batch in self.pack(pending):
+            found = self.annotate_batch(batch)
+            for keyword in batch:
+                links[keyword] = found.get(keyword) if found is not None else None
+                if found is not None:
+                    self.store_link(DBPEDIA_SPOTLIGHT_BASE, keyword, '', links[keyword])
+        return links
 
-class WikidataEntityLinker(BaseEstimator, TransformerMixin):
+
+class WikidataEntityLinker(CachedLinker, BaseEstimator, TransformerMixin):
     """ Link a list of entities to Wikidata.
 
     This transformer receives entities in a string form, and
@@ -72,12 +223,43 @@ class WikidataEntityLinker(BaseEstimator, TransformerMixin):
     with its original name and URI in Wikidata.
     """
 
-    def __init__(self):
-        self.linked_entities_cache = {}
+    def __init__(self, cache=None, max_retries=5, timeout=http_client.DEFAULT_TIMEOUT, memory_cache=None,
+                 n_jobs=None, backend='threading'):
+        self.cache = cache
+        self.memory_cache = memory_cache if memory_cache is not None else LRUCache()
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.n_jobs = n_jobs
+        self.backend = backend
 
     def fit(self, X, y=None):
         return self
 
+    def transform(self, X, language='en'):
+        """ Links a batch of entities to Wikidata.
+
+        Parameters
+        ----------
+        X : iterable of str
+            Names of the entities to be linked.
+        language : str or iterable of str
+            Preferred language of all the entities, or of every entity.
+
+        Returns
+        -------
+        list of str
+            URI of every entity, or None. Repeated (entity, language) pairs
+            are searched once, with n_jobs parallel requests.
+        """
+        X = list(X)
+        languages = [language] * len(X) if isinstance(language, str) else list(language)
+        pairs = list(zip(X, languages))
+        links = parallel_links(self.link_entity, pairs, self.n_jobs, self.backend)
+        # Workers in other processes fill their own copy of the cache
+        for (entity_label, lang), uri in links.items():
+            self.memory_cache.set((WIKIDATA_BASE, entity_label, lang), uri)
+        return [links[pair] for pair in pairs]
+
     def pick_preferred(self, x):
         for element in x:
             if 'description' in element:
@@ -104,31 +286,28 @@ class WikidataEntityLinker(BaseEstimator, TransformerMixin):
             and the second one is its 'QID' from Wikidata after linking.
             The result with the shortest label and smallest QID is selected.
         """
-        if entity_label in self.linked_entities_cache:
-            return self.linked_entities_cache[entity_label]
+        uri = self.cached_link(WIKIDATA_BASE, entity_label, language)
+        if uri is not MISSING:
+            return uri
 
-        url = f"{WIKIDATA_BASE}/api.php?action=wbsearchentities&search=" + \
-              f"{entity_label}&limit=15&language={language}&format=json"
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise Error()
+        params = {'action': 'wbsearchentities', 'search': entity_label, 'limit': 15,
+                  'language': language, 'format': 'json'}
+        # Raises requests.HTTPError when Wikidata keeps failing after the last retry
+        response = http_client.get(f"{WIKIDATA_BASE}/api.php", params=params,
+                                   policy=RetryPolicy(max_retries=self.max_retries),
+                                   timeout=self.timeout)
 
         try:
-            content = json.loads(response.text)
-        except:
+            search_results = json.loads(response.text)['search']
+        except (ValueError, KeyError):
             # invalid entity
-            self.linked_entities_cache[entity_label] = None
-            return self.link_entity(entity_label, language)
+            search_results = []
 
-        search_results = content['search']
-        if len(search_results) == 0:
-            self.linked_entities_cache[entity_label] = None
-            return self.link_entity(entity_label, language)
+        uri = None
         result = self.pick_preferred(search_results)
+        if result is not None:
+            uri = result['concepturi']
 
-        if result is None:
-            self.linked_entities_cache[entity_label] = None
-        else:
-            self.linked_entities_cache[entity_label] = result['concepturi']
-
-        return self.link_entity(entity_label, language)
+        # Labels without a link are cached too, so they are not searched again
+        self.store_link(WIKIDATA_BASE, entity_label, language, uri)
+        return uri
@@ -0,0 +1,348 @@
+""" Offline label index built from local Wikidata/DBpedia label dumps.
+
+The index is a single binary file opened with mmap, so looking up a label
+or the labels of a URI is a binary search over fixed-size records, without
+loading the index in memory nor calling any public endpoint.
+
+Dumps can be N-Triples (.nt) with rdfs:label, skos:prefLabel, skos:altLabel
+or schema:name literals, or TSV (.tsv) files with uri, label and language
+columns. Both can be gzipped (.gz). Build an index with:
+
+    python offline_index.py ../files/labels.idx wikidata-labels.nt.gz dbpedia-labels.tsv --articles publications.txt
+
+The URIs of publications (one per line, e.g. the result of a query for
+?uri wdt:P31/wdt:P279* wd:Q732577) are flagged in the index, and their
+labels are left out by the offline wrappers, as the online ones do.
+"""
+import argparse
+import bisect
+import gzip
+import mmap
+import re
+import struct
+
+from linking_entity_linking import DBPediaEntityLinker, WikidataEntityLinker
+
+MAGIC = b'TFGLBL02'
+# magic, number of uris, number of entries, offsets of strings, uris, entries and label positions
+HEADER = struct.Struct('<8sIIQQQQ')
+# uri offset, uri length, first entry, number of entries, is article
+URI_RECORD = struct.Struct('<QIII?')
+# label offset, label length, language, uri id
+ENTRY_RECORD = struct.Struct('<QIBI')
+# entry index, sorted by label
+LABEL_POSITION = struct.Struct('<I')
+
+LANGUAGES = ('en', 'es', 'ca')
+WIKIDATA_ENTITY = 'http://www.wikidata.org/entity/'
+DBPEDIA_RESOURCE = 'http://dbpedia.org/resource/'
+
+LABEL_PREDICATES = {
+    'http://www.w3.org/2000/01/rdf-schema#label',
+    'http://www.w3.org/2004/02/skos/core#prefLabel',
+    'http://www.w3.org/2004/02/skos/core#altLabel',
+    'http://schema.org/name'
+}
+NT_LABEL = re.compile(r'^<([^>]*)>\s+<([^>]*)>\s+"((?:[^"\\]|\\.)*)"@([A-Za-z-]+)\s*\.\s*$')
+NT_ESCAPE = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+NT_ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+def label_key(label):
+    # Labels are indexed lowercased and with single spaces, as the keywords are normalized
+    return " ".join(label.lower().split())
+
+
+def unescape(literal):
+    def replace(match):
+        escape = match.group(1)
+        if escape[0] in 'uU':
+            return chr(int(escape[1:], 16))
+        return NT_ESCAPES.get(escape, escape)
+    return NT_ESCAPE.sub(replace, literal)
+
+
+def open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def read_labels(path, languages=LANGUAGES):
+    # (uri, label, language) of every label of the dump in the given languages
+    tsv = path.endswith('.tsv') or path.endswith('.tsv.gz')
+    with open_dump(path) as f_in:
+        for line in f_in:
+            if tsv:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) < 3:
+                    continue
+                uri, label, lang = parts[:3]
+            else:
+                match = NT_LABEL.match(line)
+                if match is None or match.group(2) not in LABEL_PREDICATES:
+                    continue
+                uri, label, lang = match.group(1), unescape(match.group(3)), match.group(4)
+            lang = lang.lower()
+            if lang in languages and label.strip():
+                yield uri, label_key(label), lang
+
+
+def read_uris(path):
+    # URIs listed one per line (the first column), optionally between <>
+    with open_dump(path) as f_in:
+        for line in f_in:
+            parts = line.split()
+            if parts:
+                yield parts[0].strip('<>')
+
+
+def build_index(sources, path, languages=LANGUAGES, articles=()):
+    """ Build a label index file from local dumps.
+
+    Parameters
+    ----------
+    sources : list of str
+        N-Triples (.nt) or TSV (.tsv) dumps, optionally gzipped.
+    path : str
+        File of the index.
+    languages : tuple of str
+        Languages of the labels kept in the index.
+    articles : list of str
+        Files listing the URIs of publications, flagged as articles.
+
+    Returns
+    -------
+    int
+        Number of labels in the index.
+    """
+    labels = set()
+    for source in sources:
+        labels.update(read_labels(source, languages))
+
+    is_article = set()
+    for source in articles:
+        is_article.update(read_uris(source))
+
+    uris = sorted({uri for uri, _, _ in labels})
+    uri_ids = {uri: i for i, uri in enumerate(uris)}
+    lang_ids = {lang: i for i, lang in enumerate(LANGUAGES)}
+    entries = sorted(labels, key=lambda e: (uri_ids[e[0]], lang_ids[e[2]], e[1]))
+
+    strings = bytearray()
+    offsets = {}
+
+    def string(value):
+        if value not in offsets:
+            offsets[value] = (len(strings), len(value.encode('utf-8')))
+            strings.extend(value.encode('utf-8'))
+        return offsets[value]
+
+    uri_records = bytearray()
+    entry_records = bytearray()
+    first = 0
+    for i, uri in enumerate(uris):
+        count = 0
+        while first + count < len(entries) and entries[first + count][0] == uri:
+            _, label, lang = entries[first + count]
+            entry_records.extend(ENTRY_RECORD.pack(*string(label), lang_ids[lang], i))
+            count += 1
+        uri_records.extend(URI_RECORD.pack(*string(uri), first, count, uri in is_article))
+        first += count
+
+    by_label = sorted(range(len(entries)), key=lambda i: (entries[i][1], lang_ids[entries[i][2]]))
+    positions = b''.join(LABEL_POSITION.pack(i) for i in by_label)
+
+    strings_offset = HEADER.size
+    uris_offset = strings_offset + len(strings)
+    entries_offset = uris_offset + len(uri_records)
+    by_label_offset = entries_offset + len(entry_records)
+    with open(path, 'wb') as f_out:
+        f_out.write(HEADER.pack(MAGIC, len(uris), len(entries), strings_offset, uris_offset,
+                                entries_offset, by_label_offset))
+        f_out.write(strings)
+        f_out.write(uri_records)
+        f_out.write(entry_records)
+        f_out.write(positions)
+    return len(entries)
+
+
+class LabelIndex:
+    """ Read-only, memory-mapped label index built by build_index. """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n_uris, self.n_entries, self.strings, self.uris, self.entries, self.by_label = \
+            HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a label index")
+
+    def __getstate__(self):
+        # The map can't be sent to other processes, they open the file again
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def __len__(self):
+        return self.n_entries
+
+    def close(self):
+        self.buffer.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def string(self, offset, length):
+        start = self.strings + offset
+        return self.buffer[start:start + length].decode('utf-8')
+
+    def uri_record(self, i):
+        return URI_RECORD.unpack_from(self.buffer, self.uris + i * URI_RECORD.size)
+
+    def entry(self, i):
+        return ENTRY_RECORD.unpack_from(self.buffer, self.entries + i * ENTRY_RECORD.size)
+
+    def entry_by_label(self, i):
+        return LABEL_POSITION.unpack_from(self.buffer, self.by_label + i * LABEL_POSITION.size)[0]
+
+    def lookup(self, label):
+        """ URIs with the given label.
+
+        Returns
+        -------
+        list of (str, str)
+            (uri, language) of every label equal to the normalized label.
+        """
+        key = label_key(label)
+        labels = LabelKeys(self)
+        start = bisect.bisect_left(labels, key)
+        found = []
+        for position in range(start, self.n_entries):
+            label_offset, label_length, lang, uri_id = self.entry(self.entry_by_label(position))
+            if self.string(label_offset, label_length) != key:
+                break
+            uri_offset, uri_length, _, _, _ = self.uri_record(uri_id)
+            found.append((self.string(uri_offset, uri_length), LANGUAGES[lang]))
+        return found
+
+    def find(self, uri):
+        # Position of the URI in the index, or None
+        uris = UriKeys(self)
+        i = bisect.bisect_left(uris, uri)
+        if i == self.n_uris or uris[i] != uri:
+            return None
+        return i
+
+    def is_article(self, uri):
+        i = self.find(uri)
+        return i is not None and self.uri_record(i)[4]
+
+    def labels(self, uri):
+        """ Labels of a URI, as {'keyword', 'language'} dicts. """
+        i = self.find(uri)
+        if i is None:
+            return []
+        _, _, first, count, _ = self.uri_record(i)
+        labels = []
+        for entry in range(first, first + count):
+            label_offset, label_length, lang, _ = self.entry(entry)
+            labels.append({'keyword': self.string(label_offset, label_length), 'language': LANGUAGES[lang]})
+        return labels
+
+
+class LabelKeys:
+    # Labels of the index in sorted order, as a sequence for bisect
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.n_entries
+
+    def __getitem__(self, i):
+        label_offset, label_length, _, _ = self.index.entry(self.index.entry_by_label(i))
+        return self.index.string(label_offset, label_length)
+
+
+class UriKeys:
+    # URIs of the index in sorted order, as a sequence for bisect
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return self.index.n_uris
+
+    def __getitem__(self, i):
+        uri_offset, uri_length, _, _, _ = self.index.uri_record(i)
+        return self.index.string(uri_offset, uri_length)
+
+
+def qid(uri):
+    # Numeric part of a Wikidata URI, to prefer the smallest QID
+    number = uri[len(WIKIDATA_ENTITY) + 1:]
+    return int(number) if number.isdigit() else float('inf')
+
+
+class OfflineWikidataEntityLinker(WikidataEntityLinker):
+    """ WikidataEntityLinker that links against a LabelIndex instead of Wikidata. """
+
+    def __init__(self, index=None):
+        super().__init__()
+        self.index = index
+
+    def link_entity(self, entity_label, language):
+        """ Links a single entity to the Wikidata URIs of the index.
+
+        Labels in the preferred language come first, and among them the
+        smallest QID is selected.
+        """
+        candidates = [(lang != language, qid(uri), uri) for uri, lang in self.index.lookup(entity_label)
+                      if uri.startswith(WIKIDATA_ENTITY)]
+        if not candidates:
+            return None
+        return min(candidates)[2]
+
+
+class OfflineDBPediaEntityLinker(DBPediaEntityLinker):
+    """ DBPediaEntityLinker that links against a LabelIndex instead of Spotlight. """
+
+    def __init__(self, index=None):
+        super().__init__()
+        self.index = index
+
+    def link_entities(self, text):
+        # Only the whole text is matched, preferring english labels and the shortest URI
+        candidates = [(lang != 'en', len(uri), uri) for uri, lang in self.index.lookup(text)
+                      if uri.startswith(DBPEDIA_RESOURCE)]
+        if not candidates:
+            return None
+        return min(candidates)[2]
+
+
+def Wikidata_offline_wrapper(url, index):
+    # Same result as compacting_keys.Wikidata_wrapper, read from the index: publications have no labels
+    return [] if index.is_article(url) else index.labels(url)
+
+
+def DBpedia_offline_wrapper(url, index):
+    # Same result as compacting_keys.DBpedia_wrapper, read from the index: publications have no labels
+    return [] if index.is_article(url) else index.labels(url)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build an offline label index from local dumps")
+    parser.add_argument('index', help="index file to create")
+    parser.add_argument('dumps', nargs='+', help="N-Triples (.nt) or TSV (.tsv) label dumps, optionally gzipped")
+    parser.add_argument('--languages', nargs='+', default=list(LANGUAGES), choices=LANGUAGES)
+    parser.add_argument('--articles', nargs='+', default=[],
+                        help="files listing the URIs of publications, whose labels are not used")
+    args = parser.parse_args()
+
+    total = build_index(args.dumps, args.index, tuple(args.languages), args.articles)
+    print("Indexed {} labels in {}".format(total, args.index))
@@ -0,0 +1,306 @@
+""" Streaming N-Triples and Turtle writers for the SKOS serialization.
+
+The triples are written to the file as the compacted keys and the
+researcher terms are iterated, without building an rdflib Graph, so memory
+doesn't grow with the output. tfg_nlp.serialization keeps the rdflib path.
+
+write_shards splits the triples by subject into shards serialized in a
+process pool, and merge_shards joins them into one sorted file. Subjects,
+labels and terms are sorted, so the same triples always give the same bytes.
+"""
+import hashlib
+import heapq
+import json
+import multiprocessing
+import os
+import re
+import zlib
+from itertools import groupby
+
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS_LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
+SKOS_CONCEPT = 'http://www.w3.org/2004/02/skos/core#Concept'
+VIVO_HAS_RESEARCH_AREA = 'http://vivoweb.org/ontology/core#hasResearchArea'
+
+# Fixed prefixes of the Turtle output, the same ones bound by serialization
+PREFIXES = (
+    ('core', 'http://vivoweb.org/ontology/core#'),
+    ('rdfs', 'http://www.w3.org/2000/01/rdf-schema#'),
+    ('skos', 'http://www.w3.org/2004/02/skos/core#'),
+)
+
+# Characters not allowed in an IRI reference, written as \uXXXX
+IRI_ESCAPE = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+# Characters escaped inside a string literal
+LITERAL_ESCAPE = re.compile(r'[\x00-\x1f"\\\x7f]')
+LITERAL_ESCAPES = {'"': '\\"', '\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+
+
+def iri(uri):
+    return '<' + IRI_ESCAPE.sub(lambda match: '\\u{:04X}'.format(ord(match.group())), uri) + '>'
+
+
+def literal(text, lang=None):
+    escaped = LITERAL_ESCAPE.sub(lambda match: LITERAL_ESCAPES.get(match.group(), '\\u{:04X}'.format(
+        ord(match.group()))), text)
+    return '"' + escaped + '"' + ('@' + lang if lang else '')
+
+
+class NTriplesWriter:
+    """ Writes one triple per line.
+
+    Parameters
+    ----------
+    f_out : file
+        Text file opened for writing, in UTF-8.
+    """
+
+    header = ''
+
+    def __init__(self, f_out):
+        self.f_out = f_out
+        self.triples = 0
+
+    def start(self):
+        self.f_out.write(self.header)
+
+    def concept_units(self, uri, labels):
+        # Units are the pieces sorted by the sharded serialization: lines here
+        subject = iri(uri)
+        units = ['{} <{}> <{}> .\n'.format(subject, RDF_TYPE, SKOS_CONCEPT)]
+        units.extend('{} <{}> {} .\n'.format(subject, RDFS_LABEL, literal(label['keyword'], label['language']))
+                     for label in labels)
+        return units
+
+    def research_area_units(self, researcher, terms):
+        subject = iri(researcher)
+        return ['{} <{}> {} .\n'.format(subject, VIVO_HAS_RESEARCH_AREA, iri(term)) for term in terms]
+
+    def concept(self, uri, labels):
+        self.f_out.write(''.join(self.concept_units(uri, labels)))
+        self.triples += 1 + len(labels)
+
+    def research_areas(self, researcher, terms):
+        self.f_out.write(''.join(self.research_area_units(researcher, terms)))
+        self.triples += len(terms)
+
+
+class TurtleWriter(NTriplesWriter):
+    """ Writes one Turtle block per subject, with the fixed PREFIXES. """
+
+    header = ''.join('@prefix {}: <{}> .\n'.format(prefix, namespace) for prefix, namespace in PREFIXES) + '\n'
+
+    def concept_units(self, uri, labels):
+        # Units are whole subject blocks, ended by a blank line
+        objects = [literal(label['keyword'], label['language']) for label in labels]
+        block = '{} a skos:Concept'.format(iri(uri))
+        if objects:
+            block += ' ;\n    rdfs:label ' + ',\n        '.join(objects)
+        return [block + ' .\n\n']
+
+    def research_area_units(self, researcher, terms):
+        if not terms:
+            return []
+        objects = [iri(term) for term in terms]
+        return ['{} core:hasResearchArea {} .\n\n'.format(iri(researcher), ',\n        '.join(objects))]
+
+
+WRITERS = {
+    'nt': NTriplesWriter,
+    'turtle': TurtleWriter,
+}
+
+
+def write_rdf(researcher_terms, com_keys, f_out, format='turtle'):
+    """ Write the SKOS concepts and the research areas of the researchers.
+
+    Parameters
+    ----------
+    researcher_terms : iterable of dict
+        {'researcher', 'term'} pairs. Consecutive pairs of the same researcher
+        are written together, so it can be a generator reading a file. Pairs
+        are expected once, as compare_resource_keywords_uri leaves them: only
+        repeated terms of consecutive pairs are written once.
+    com_keys : mapping
+        Compacted labels by uri. Uris that only differ in their quotes, which
+        are deleted as in serialization, are written as a single concept.
+    f_out : file
+        Text file opened for writing, in UTF-8.
+    format : str
+        'turtle' or 'nt' (N-Triples).
+
+    Returns
+    -------
+    int
+        Number of triples written.
+    """
+    writer = WRITERS[format](f_out)
+    writer.start()
+    # Quoted uris, by the uri they become once their quotes are deleted
+    quoted = {}
+    for uri in com_keys:
+        if '"' in uri:
+            quoted.setdefault(uri.replace('"', ''), []).append(uri)
+    for uri, labels in com_keys.items():
+        if '"' not in uri:
+            writer.concept(uri, merge_labels(com_keys, [uri] + quoted.pop(uri, [])))
+    for uri, uris in quoted.items():
+        writer.concept(uri, merge_labels(com_keys, uris))
+    for researcher, terms in groupby(researcher_terms, key=lambda pair: pair['researcher']):
+        writer.research_areas(researcher, list(dict.fromkeys(pair['term'] for pair in terms)))
+    return writer.triples
+
+
+def merge_labels(com_keys, uris):
+    # Labels of several uris written as one concept, without repeating a label
+    if len(uris) == 1:
+        return com_keys[uris[0]]
+    labels = {}
+    for uri in uris:
+        for label in com_keys[uri]:
+            labels.setdefault((label['keyword'], label['language']), label)
+    return list(labels.values())
+
+
+# ----------------- Sharded serialization -----------------
+EXTENSIONS = {
+    'nt': '.nt',
+    'turtle': '.ttl',
+}
+MANIFEST = 'manifest.json'
+
+
+def shard_of(subject, shards):
+    # crc32 is stable between runs and processes, unlike hash()
+    return zlib.crc32(subject.encode('utf-8')) % shards
+
+
+def partition(researcher_terms, com_keys, shards):
+    """ Concepts and research areas of every shard, without repeated triples.
+
+    Returns
+    -------
+    list of (dict, dict)
+        For every shard, uri -> set of (keyword, language) and
+        researcher -> set of terms.
+    """
+    parts = [({}, {}) for _ in range(shards)]
+    for uri, labels in com_keys.items():
+        uri = uri.replace('"', '')
+        concepts = parts[shard_of(uri, shards)][0]
+        concepts.setdefault(uri, set()).update((label['keyword'], label['language']) for label in labels)
+    for pair in researcher_terms:
+        areas = parts[shard_of(pair['researcher'], shards)][1]
+        areas.setdefault(pair['researcher'], set()).add(pair['term'])
+    return parts
+
+
+def serialize_shard(task):
+    """ Write the sorted units of a shard.
+
+    Parameters
+    ----------
+    task : tuple
+        (path, format, concepts, areas), with concepts a list of
+        (uri, labels) and areas a list of (researcher, terms), labels and
+        terms already sorted.
+
+    Returns
+    -------
+    dict
+        Manifest entry of the shard: file, triples and sha256.
+    """
+    path, format, concepts, areas = task
+    writer = WRITERS[format](None)
+    units = []
+    triples = 0
+    for uri, labels in concepts:
+        units.extend(writer.concept_units(uri, [{'keyword': keyword, 'language': language}
+                                                for keyword, language in labels]))
+        triples += 1 + len(labels)
+    for researcher, terms in areas:
+        units.extend(writer.research_area_units(researcher, terms))
+        triples += len(terms)
+    units.sort()
+    data = (writer.header + ''.join(units)).encode('utf-8')
+    with open(path, 'wb') as f_out:
+        f_out.write(data)
+    return {'file': os.path.basename(path), 'triples': triples, 'sha256': hashlib.sha256(data).hexdigest()}
+
+
+def write_shards(researcher_terms, com_keys, directory, format='turtle', shards=4, processes=None):
+    """ Serialize the triples as a set of shards and a manifest.
+
+    Concepts are assigned to a shard by the crc32 of their uri and research
+    areas by the crc32 of the researcher, so every subject is in one shard.
+    Each shard is a valid file on its own, with its units (subject blocks
+    in Turtle, lines in N-Triples) sorted.
+
+    Parameters
+    ----------
+    researcher_terms : iterable of dict
+        {'researcher', 'term'} pairs.
+    com_keys : mapping
+        Compacted labels by uri.
+    directory : str
+        Directory of the shards and manifest.json, created if missing.
+    format : str
+        'turtle' or 'nt' (N-Triples).
+    shards : int
+        Number of shards.
+    processes : int, optional
+        Processes of the pool. Defaults to the number of shards.
+
+    Returns
+    -------
+    dict
+        The manifest: format, total triples and the entry of every shard.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tasks = []
+    for i, (concepts, areas) in enumerate(partition(researcher_terms, com_keys, shards)):
+        path = os.path.join(directory, 'part-{:05d}{}'.format(i, EXTENSIONS[format]))
+        tasks.append((path, format,
+                      [(uri, sorted(labels)) for uri, labels in concepts.items()],
+                      [(researcher, sorted(terms)) for researcher, terms in areas.items()]))
+
+    with multiprocessing.Pool(processes or shards) as pool:
+        entries = pool.map(serialize_shard, tasks)
+
+    manifest = {'format': format, 'triples': sum(entry['triples'] for entry in entries), 'shards': entries}
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8', newline='\n') as f_out:
+        f_out.write(json.dumps(manifest, indent=1, sort_keys=True) + '\n')
+    return manifest
+
+
+def read_units(path, format):
+    # Units of a shard, skipping the prefixes of the Turtle header
+    with open(path, 'r', encoding='utf-8', newline='\n') as f_in:
+        if format == 'nt':
+            yield from f_in
+            return
+        unit = []
+        for line in f_in:
+            unit.append(line)
+            if line == '\n':
+                if not unit[0].startswith('@prefix'):
+                    yield ''.join(unit)
+                unit = []
+
+
+def merge_shards(directory, destination):
+    """ Merge the shards of write_shards into one sorted file.
+
+    Returns
+    -------
+    int
+        Number of triples written.
+    """
+    with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f_in:
+        manifest = json.load(f_in)
+    format = manifest['format']
+    units = [read_units(os.path.join(directory, entry['file']), format) for entry in manifest['shards']]
+    with open(destination, 'w', encoding='utf-8', newline='\n') as f_out:
+        f_out.write(WRITERS[format].header)
+        f_out.writelines(heapq.merge(*units))
+    return manifest['triples']
@@ -0,0 +1,166 @@
+""" Compact records for the keyword results (d_key) and the compacted labels (com_keys).
+
+Tens of thousands of small dicts and lists cost far more memory than their
+content. These records keep the same content in __slots__ objects and
+tuples, with interned language codes and uris stored without their common
+prefix, and behave as the dicts and lists they replace: they can be read
+with [], iterated, compared with dicts and lists and printed like them.
+"""
+import sys
+from collections.abc import Mapping, MutableMapping, Sequence
+
+# Common uri prefixes, stored as a single control character
+URI_PREFIXES = (
+    'http://www.wikidata.org/entity/',
+    'http://dbpedia.org/resource/',
+    'http://es.dbpedia.org/resource/',
+)
+# Languages of the labels, stored as one byte per label
+LANGUAGES = ['en', 'es', 'ca']
+LANGUAGE_IDS = {lang: i for i, lang in enumerate(LANGUAGES)}
+
+
+def compress_uri(uri):
+    if uri is None:
+        return None
+    for code, prefix in enumerate(URI_PREFIXES, 1):
+        if uri.startswith(prefix):
+            return chr(code) + uri[len(prefix):]
+    return uri
+
+
+def expand_uri(uri):
+    if uri and ord(uri[0]) <= len(URI_PREFIXES):
+        return URI_PREFIXES[ord(uri[0]) - 1] + uri[1:]
+    return uri
+
+
+def language_id(lang):
+    # Languages not seen before are added to the table (at most 256)
+    if lang not in LANGUAGE_IDS:
+        LANGUAGE_IDS[lang] = len(LANGUAGES)
+        LANGUAGES.append(lang)
+    return LANGUAGE_IDS[lang]
+
+
+def to_builtin(obj):
+    # json.dumps default for the records
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    if isinstance(obj, Sequence):
+        return list(obj)
+    raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+
+class KeywordResult(Mapping):
+    """ Result of process() for a keyword, read as the dict it replaces.
+
+    Keys are 'lang', 'stop-word', 'lemmatizer', 'Wikidata' and 'DBpedia'.
+    """
+
+    __slots__ = ('lang', 'stop_word', 'lemmatizer', 'wikidata', 'dbpedia')
+    KEYS = ('lang', 'stop-word', 'lemmatizer', 'Wikidata', 'DBpedia')
+
+    def __init__(self, lang=None, stop_word=None, lemmatizer=None, wikidata=None, dbpedia=None):
+        self.lang = sys.intern(lang) if lang is not None else None
+        self.stop_word = stop_word
+        self.lemmatizer = lemmatizer
+        self.wikidata = compress_uri(wikidata)
+        self.dbpedia = compress_uri(dbpedia)
+
+    @classmethod
+    def from_dict(cls, result):
+        return cls(result.get('lang'), result.get('stop-word'), result.get('lemmatizer'),
+                   result.get('Wikidata'), result.get('DBpedia'))
+
+    def __getitem__(self, key):
+        if key == 'lang':
+            return self.lang
+        if key == 'stop-word':
+            return self.stop_word
+        if key == 'lemmatizer':
+            return self.lemmatizer
+        if key == 'Wikidata':
+            return expand_uri(self.wikidata)
+        if key == 'DBpedia':
+            return expand_uri(self.dbpedia)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __reduce__(self):
+        return self.__class__.from_dict, (dict(self),)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class LabelList(Sequence):
+    """ Labels of a uri, read as a list of {'keyword', 'language'} dicts. """
+
+    __slots__ = ('keywords', 'languages')
+
+    def __init__(self, labels=()):
+        labels = list(labels)
+        self.keywords = tuple(label['keyword'] for label in labels)
+        self.languages = bytes(language_id(label['language']) for label in labels)
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        # (keyword, language) pairs
+        return cls({'keyword': keyword, 'language': language} for keyword, language in pairs)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return {'keyword': self.keywords[i], 'language': LANGUAGES[self.languages[i]]}
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __eq__(self, other):
+        if isinstance(other, (LabelList, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __reduce__(self):
+        # Language ids are only valid in this process
+        return self.__class__, (list(self),)
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class CompactKeys(MutableMapping):
+    """ Compacted labels by uri (com_keys), read as the dict it replaces. """
+
+    __slots__ = ('labels',)
+
+    def __init__(self, items=()):
+        self.labels = {}
+        self.update(items)
+
+    def __getitem__(self, uri):
+        return self.labels[compress_uri(uri)]
+
+    def __setitem__(self, uri, labels):
+        self.labels[compress_uri(uri)] = labels if isinstance(labels, LabelList) else LabelList(labels)
+
+    def __delitem__(self, uri):
+        del self.labels[compress_uri(uri)]
+
+    def __iter__(self):
+        return (expand_uri(uri) for uri in self.labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __reduce__(self):
+        return self.__class__, (list(self.items()),)
+
+    def __repr__(self):
+        return repr(dict(self))
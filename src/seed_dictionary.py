@@ -0,0 +1,175 @@
+""" Known keyword -> URI links taken from the outputs of a previous run.
+
+compacting_keys.csv stores, for every URI, the keyword that was linked to it
+followed by its labels in every language, and replace-keywords-uri.csv the
+URIs actually assigned to the researchers. Both are enough to resolve a
+keyword (or its lemma) that was already linked to that URI without calling
+its endpoint. The other labels of the URI were never linked, so they aren't
+used.
+"""
+import csv
+import os
+from collections import Counter, deque
+
+from compact_store import read_compacting_keys
+
+WIKIDATA_ENTITY = 'http://www.wikidata.org/entity/'
+
+
+def seed_key(label):
+    # Same form as the normalized keywords: lowercase and single spaces
+    return " ".join(label.lower().split())
+
+
+class AhoCorasick:
+    """ Multi-pattern matcher finding every known label inside a text in one pass.
+
+    Parameters
+    ----------
+    patterns : iterable of str
+        Labels to look for.
+    """
+
+    def __init__(self, patterns):
+        # Trie as a list of states: transitions, failure link and patterns ending in the state
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern in patterns:
+            self.add(pattern)
+        self.build()
+
+    def add(self, pattern):
+        state = 0
+        for char in pattern:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append(pattern)
+
+    def build(self):
+        # Breadth-first, so the failure link of a state is always built before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[child] = self.goto[fail].get(char, 0)
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def iter(self, text):
+        """ (start, pattern) of every occurrence of a pattern in the text. """
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern in self.output[state]:
+                yield end - len(pattern), pattern
+
+
+class SeedDictionary:
+    """ Exact-match links of keywords already linked by a previous run.
+
+    Parameters
+    ----------
+    links : dict
+        Mapping normalized label -> URI.
+    """
+
+    def __init__(self, links):
+        self.links = links
+        self._matcher = None
+
+    @classmethod
+    def load(cls, compacting_file, replace_file=None):
+        """ Seed dictionary from compacting_keys.csv and replace-keywords-uri.csv.
+
+        The compacted keys can also be the Arrow file of compact_store.
+
+        Only the keyword linked to every URI (its first label) is seeded. A
+        keyword linked to several URIs resolves to the URI assigned to more
+        researchers, then to the Wikidata URI.
+        Missing files give an empty dictionary.
+        """
+        usage = Counter()
+        if replace_file and os.path.exists(replace_file):
+            with open(replace_file, 'r', encoding='utf-8') as f_in:
+                reader = csv.reader(f_in)
+                next(reader, None)
+                usage.update(row[1] for row in reader if len(row) > 1)
+
+        candidates = {}
+        if os.path.exists(compacting_file):
+            for uri, labels in read_compacting_keys(compacting_file).items():
+                if not labels:
+                    continue
+                rank = (usage[uri], uri.startswith(WIKIDATA_ENTITY))
+                key = seed_key(labels[0]['keyword'])
+                if key not in candidates or rank > candidates[key][0]:
+                    candidates[key] = (rank, uri)
+
+        return cls({key: uri for key, (_, uri) in candidates.items()})
+
+    def __len__(self):
+        return len(self.links)
+
+    def __contains__(self, keyword):
+        return seed_key(keyword) in self.links
+
+    def get(self, keyword):
+        return self.links.get(seed_key(keyword))
+
+    def link(self, keyword, lemma=None):
+        """ Links of a keyword known by the seed, in the form process() stores them.
+
+        The lemma is looked up first, as the linkers do. Only the URI that
+        ended up in the compacting output is known, so the other endpoint is
+        left out, to be linked as usual.
+
+        Returns
+        -------
+        dict or None
+            {'Wikidata': uri} or {'DBpedia': uri}, or None if neither the
+            lemma nor the keyword are known.
+        """
+        uri = None
+        if lemma is not None:
+            uri = self.get(lemma)
+        if uri is None:
+            uri = self.get(keyword)
+        if uri is None:
+            return None
+        if uri.startswith(WIKIDATA_ENTITY):
+            return {'Wikidata': uri}
+        return {'DBpedia': uri}
+
+    @property
+    def matcher(self):
+        # Built on first use, only needed to search inside compound keywords
+        if self._matcher is None:
+            self._matcher = AhoCorasick(self.links)
+        return self._matcher
+
+    def find_labels(self, keyword):
+        """ Known labels found as whole words inside a longer keyword.
+
+        Returns
+        -------
+        list of (str, str)
+            (label, uri) in order of appearance, longest label first when
+            several start at the same word.
+        """
+        text = seed_key(keyword)
+        found = []
+        for start, label in self.matcher.iter(text):
+            end = start + len(label)
+            if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                found.append((start, -len(label), label))
+        return [(label, self.links[label]) for _, _, label in sorted(found)]
@@ -0,0 +1,80 @@
+from functools import lru_cache
+
+import pandas as pd
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from stop_words import get_stop_words
+
+# Where the stop words of every language come from
+STOPWORDS_SOURCES = {
+    'en': lambda: stopwords.words('english'),
+    'es': lambda: stopwords.words('spanish'),
+    'ca': lambda: get_stop_words('ca')
+}
+
+
+@lru_cache(maxsize=None)
+def stopword_set(lang):
+    # Build the stop words of a language only once per process
+    if lang not in STOPWORDS_SOURCES:
+        return frozenset()
+    return frozenset(STOPWORDS_SOURCES[lang]())
+
+
+def remove_stopwords(keyword, lang):
+    sw = stopword_set(lang)
+
+    return [word for word in word_tokenize(keyword) if word not in sw]
+
+
+def remove_stopwords_batch(keywords, languages):
+    """ Delete the stop words of a batch of keywords.
+
+    Parameters
+    ----------
+    keywords : list of str
+        Keywords to be tokenized.
+    languages : list of str
+        Language of each keyword (en, es, ca).
+
+    Returns
+    -------
+    list of list of str
+        Tokens without stop words of each keyword, in the same order.
+    """
+    return [remove_stopwords(keyword, lang) for keyword, lang in zip(keywords, languages)]
+
+
+def remove_stopwords_series(keywords, languages):
+    """ Vectorized version of remove_stopwords_batch for pandas.
+
+    Parameters
+    ----------
+    keywords : pandas.Series
+        Keywords to be tokenized.
+    languages : pandas.Series or list of str
+        Language of each keyword, aligned by position with keywords.
+
+    Returns
+    -------
+    pandas.Series
+        List of tokens without stop words, with the index of keywords.
+    """
+    positions = pd.RangeIndex(len(keywords))
+    text = pd.Series(list(keywords), index=positions)
+    langs = pd.Series(list(languages), index=positions)
+
+    # One row per token, indexed by the position of its keyword
+    tokens = text.map(word_tokenize).explode()
+    token_langs = langs.reindex(tokens.index)
+
+    keep = pd.Series(False, index=tokens.index)
+    for lang in token_langs.dropna().unique():
+        in_lang = token_langs == lang
+        keep |= in_lang & ~tokens.isin(stopword_set(lang))
+    keep &= tokens.notna()
+
+    grouped = tokens[keep].groupby(level=0).agg(list)
+    result = [grouped[i] if i in grouped.index else [] for i in positions]
+
+    return pd.Series(result, index=keywords.index)
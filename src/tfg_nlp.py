@@ -1,25 +1,31 @@
+import argparse
 import csv
 import pandas as pd
 import spacy
 import pycld2 as cld2
 import re
 import multiprocessing
+import os
+import tempfile
 
 # import hunspell
 
 from linking_entity_linking import *
 from compacting_keys import *
 
-from rake_nltk import Rake
-from string import punctuation
-from spacy.lang.en.stop_words import STOP_WORDS as ENGLISH_STOP_WORDS
-from spacy.lang.es.stop_words import STOP_WORDS as SPANISH_STOP_WORDS
-from spacy.lang.ca.stop_words import STOP_WORDS as CATALAN_STOP_WORDS
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from stop_words import get_stop_words  # will be used for catalan
+from stopwords_filter import remove_stopwords
 from nltk.corpus import wordnet
-from nltk.stem import SnowballStemmer
+from grouping import GroupIndex, get_stemmer
+from link_cache import LinkCache, LRUCache
+from async_linking import AsyncEntityLinker
+from offline_index import LabelIndex, OfflineWikidataEntityLinker, OfflineDBPediaEntityLinker, \
+    Wikidata_offline_wrapper, DBpedia_offline_wrapper
+from seed_dictionary import SeedDictionary
+from checkpoint import CheckpointStore
+from compaction import CompactingKeys
+from compact_store import write_compacting_keys
+from records import KeywordResult, to_builtin
+from rdf_writer import write_rdf, write_shards, merge_shards
 from collections import defaultdict
 from tqdm import tqdm
 from rdflib import Graph, RDF, RDFS, SKOS, URIRef, Literal
@@ -96,42 +102,60 @@ def hyponyms(clave):
 
 
 # -------------- Language detector --------------
-def language_keyword(keyword):
-    r = {
-        'en': Rake(stopwords=ENGLISH_STOP_WORDS, punctuations=punctuation),
-        'es': Rake(stopwords=SPANISH_STOP_WORDS, punctuations=punctuation),
-        'ca': Rake(stopwords=CATALAN_STOP_WORDS, punctuations=punctuation)
-    }
-    _, _, details = cld2.detect(keyword.encode('utf-8', 'replace'), isPlainText=True, bestEffort=True)
-    lang = details[0][1]
-    if not lang in r.keys():
-        lang = 'en'  # Default language
-    return lang
+SUPPORTED_LANGUAGES = ('en', 'es', 'ca')
+DEFAULT_LANGUAGE = 'en'
 
+# cld2 results already computed in this process, by normalized keyword
+language_cache = {}
 
-# -------------- Delete stop words --------------
-def en_stopWords(keyword):
-    text_tokens = word_tokenize(keyword)
 
-    tokens_without_sw = [word for word in text_tokens if word not in stopwords.words('english')]
+def detect_language(keyword):
+    # Language code detected by cld2 on the original text and its confidence (percent of the text).
+    # The normalized keyword is only the cache key
+    key = normalize(keyword)
+    if key not in language_cache:
+        _, _, details = cld2.detect(keyword.encode('utf-8', 'replace'), isPlainText=True, bestEffort=True)
+        language_cache[key] = (details[0][1], details[0][2])
+    return language_cache[key]
 
-    return tokens_without_sw
 
+def language_keyword(keyword, min_confidence=0):
+    lang, confidence = detect_language(keyword)
+    if lang not in SUPPORTED_LANGUAGES or confidence < min_confidence:
+        lang = DEFAULT_LANGUAGE  # Default language
+    return lang
 
-def es_stopWords(keyword):
-    text_tokens = word_tokenize(keyword)
 
-    tokens_without_sw = [word for word in text_tokens if word not in stopwords.words('spanish')]
+def detect_languages(keywords, min_confidence=0):
+    """ Detect the language of a batch of keywords.
 
-    return tokens_without_sw
+    Parameters
+    ----------
+    keywords : iterable of str
+        Keywords to be classified.
+    min_confidence : int
+        Minimum cld2 confidence (0-100) to accept a detection, otherwise
+        the default language is used.
 
+    Returns
+    -------
+    list of str
+        Language code of each keyword, in the same order.
+    """
+    return [language_keyword(keyword, min_confidence) for keyword in keywords]
 
-def ca_stopWords(keyword):
-    text_tokens = word_tokenize(keyword)
 
-    tokens_without_sw = [word for word in text_tokens if word not in get_stop_words('ca')]
+# -------------- Delete stop words --------------
+def en_stopWords(keyword):
+    return remove_stopwords(keyword, 'en')
 
-    return tokens_without_sw
+
+def es_stopWords(keyword):
+    return remove_stopwords(keyword, 'es')
+
+
+def ca_stopWords(keyword):
+    return remove_stopwords(keyword, 'ca')
 
 
 # -------------- Word synonyms --------------
@@ -147,58 +171,132 @@ def synonyms(keyword):
 
 # -------------- Root words (derivació regressiva) --------------
 def en_stemmer(keyword):
-    en_stem = SnowballStemmer('english')
+    en_stem = get_stemmer('en')
 
     stemmer = en_stem.stem(keyword)
     return stemmer
 
 
 def es_stemmer(keyword):
-    es_stem = SnowballStemmer('spanish')
+    es_stem = get_stemmer('es')
 
     stemmer = es_stem.stem(keyword)
     return stemmer
 
 
 # -------------- spaCy lemmatizer --------------
-def en_lemmatizer(keyword):
-    nlp = spacy.load('en_core_web_sm', disable=["parser", "ner"])
-    doc = nlp(keyword)
+SPACY_MODELS = {
+    'en': 'en_core_web_sm',
+    'es': 'es_core_news_sm',
+    'ca': 'ca_fasttext_wiki_md'
+}
 
-    w = " ".join([word.lemma_ for word in doc])
-    return w
+# Pipelines already loaded in this process, by language
+nlp_models = {}
 
 
-def es_lemmatizer(keyword):
-    nlp = spacy.load('es_core_news_sm', disable=["parser", "ner"])
-    doc = nlp(keyword)
+def load_nlp(lang):
+    # Load the spaCy pipeline of a language only the first time it is requested
+    if lang not in nlp_models:
+        nlp_models[lang] = spacy.load(SPACY_MODELS[lang], disable=["parser", "ner"])
+    return nlp_models[lang]
 
-    w = " ".join([word.lemma_ for word in doc])
-    return w
 
+def init_worker(languages=tuple(SPACY_MODELS), cache_file=None, index_file=None):
+    # Pool initializer: warm up the pipelines the worker is going to use
+    for lang in languages:
+        load_nlp(lang)
+
+    # Links found by any worker are shared through the persistent cache
+    global link_cache, memory_cache, label_index, wikidata_linker, dbpedia_linker
+    link_cache = LinkCache(cache_file) if cache_file else None
+    # Every lookup of the worker shares the same bounded in-memory cache
+    memory_cache = LRUCache(max_entries=memory_cache_entries)
+    # With an offline label index no public endpoint is called
+    label_index = LabelIndex(index_file) if index_file else None
+    wikidata_linker = None
+    dbpedia_linker = None
 
-def ca_lemmatizer(keyword):
-    nlp = spacy.load('ca_fasttext_wiki_md', disable=["parser", "ner"])
-    doc = nlp(keyword)
+
+def lemmatizer(keyword, lang):
+    doc = load_nlp(lang)(keyword)
 
     w = " ".join([word.lemma_ for word in doc])
     return w
 
 
+def en_lemmatizer(keyword):
+    return lemmatizer(keyword, 'en')
+
+
+def es_lemmatizer(keyword):
+    return lemmatizer(keyword, 'es')
+
+
+def ca_lemmatizer(keyword):
+    return lemmatizer(keyword, 'ca')
+
+
+def lemmatize_keywords(keywords, batch_size=1000, n_process=1):
+    """ Lemmatize a whole list of keywords grouped by language.
+
+    Parameters
+    ----------
+    keywords : list of str
+        Deduplicated keywords, as returned by keywords_cleaner.
+    batch_size : int
+        Number of keywords sent together through nlp.pipe.
+    n_process : int
+        Number of processes used by nlp.pipe for each language.
+
+    Returns
+    -------
+    dict
+        Mapping keyword -> lemma.
+    """
+    buckets = defaultdict(list)
+    for keyword, lang in zip(keywords, detect_languages(keywords)):
+        buckets[lang].append(keyword)
+
+    lemmas = {}
+    for lang, bucket in buckets.items():
+        docs = load_nlp(lang).pipe(bucket, batch_size=batch_size, n_process=n_process)
+        for keyword, doc in zip(bucket, docs):
+            lemmas[keyword] = " ".join([word.lemma_ for word in doc])
+    return lemmas
+
+
 # -------------- Linkers --------------
+# Linkers shared by every lookup of this process
+link_cache = None
+# Maximum number of links kept in memory by each worker
+memory_cache_entries = 100000
+memory_cache = LRUCache(max_entries=memory_cache_entries)
+label_index = None
+wikidata_linker = None
+dbpedia_linker = None
+
 
 def WikidataLinker(keyword, language):
-    linker = WikidataEntityLinker()
+    global wikidata_linker
+    if wikidata_linker is None and label_index is not None:
+        wikidata_linker = OfflineWikidataEntityLinker(label_index)
+    elif wikidata_linker is None:
+        wikidata_linker = WikidataEntityLinker(cache=link_cache, memory_cache=memory_cache)
 
-    entity = linker.link_entity(keyword, language)
+    entity = wikidata_linker.link_entity(keyword, language)
 
     return entity
 
 
 def DBpediaLinker(keyword):
-    linker = DBPediaEntityLinker()
+    global dbpedia_linker
+    if dbpedia_linker is None and label_index is not None:
+        dbpedia_linker = OfflineDBPediaEntityLinker(label_index)
+    elif dbpedia_linker is None:
+        dbpedia_linker = DBPediaEntityLinker(cache=link_cache, memory_cache=memory_cache)
 
-    entity = linker.link_entities(keyword)
+    entity = dbpedia_linker.link_entities(keyword)
 
     return entity
 
@@ -213,7 +311,7 @@ def group(keyword, lang):
         if lang == 'en':
             res[en_stemmer(k)].append(k)
         elif lang == 'es':
-            res[en_stemmer(k)].append(k)
+            res[es_stemmer(k)].append(k)
         else:
             res[ca_lemmatizer(k)].append(k)
     return res
@@ -247,15 +345,7 @@ def clean_file(f_in):
     # Get the data from the file
     df = pd.read_csv(f_in, delimiter=',')
 
-    # Delete duplicates rows
-    df.drop_duplicates(subset=None, keep="first", inplace=True)
-
-    # Delete multiple keywords in one line separated by punctuation marks
-    df_split = splitter(df)
-
-    # Delete words with less than 3 words
-    df_split = df_split[df_split['keyword'].str.len() > 4]
-    df_split.reset_index(drop=True)
+    df_split = clean_chunk(df)
 
     df_split.to_csv(f_in, index=False)
 
@@ -264,31 +354,131 @@ def clean_file(f_in):
     return df_dict
 
 
-def splitter(df):
-    # Split multiple keywords in one row
+def clean_chunk(df):
+    # Delete duplicates rows
+    df = df.drop_duplicates(subset=None, keep="first")
 
-    # Delete words in parentheses
-    df['keyword'] = df['keyword'].str.replace(r"\s*\([^()]*\)", "").str.strip()
-    df['keyword'] = df['keyword'].str.partition('(')
-    # Delete words between brakets
-    df['keyword'] = df['keyword'].str.replace(r"(\s*\[.*?\]\s*)", "").str.strip()
+    # Delete multiple keywords in one line separated by punctuation marks
+    df_split = splitter(df)
 
-    # Split by punctuation marks
-    df['keyword'] = df['keyword'].str.split('[;,/]|\. |- | -')
-    df = df.explode('keyword')
-    df['keyword'] = df['keyword'].str.strip()
+    # Delete words with less than 3 words
+    df_split = df_split[df_split['keyword'].str.len() > 4]
+    df_split.reset_index(drop=True)
 
-    # Deletes empty values in dataframe
-    nan_value = float("NaN")
-    df.replace("", nan_value, inplace=True)
-    df.dropna(subset=['keyword'], inplace=True)
-    df.reset_index(drop=True)
+    return df_split
+
+
+def stream_records(f_in, chunksize=100000, f_out=None):
+    """ Clean the keywords file in blocks of rows, without loading it at once.
+
+    Parameters
+    ----------
+    f_in : str
+        File written by correct_keywords_file.
+    chunksize : int
+        Number of rows read, split and filtered at a time.
+    f_out : str, optional
+        File where the cleaned rows are written, as clean_file does. It can
+        be f_in, which is then replaced once the whole file is read.
+
+    Yields
+    ------
+    dict
+        Cleaned {'resource', 'keyword'} records. Duplicated rows are only
+        removed inside each block.
+    """
+    path = f_out + '.tmp' if f_out is not None and f_out == f_in else f_out
+    f_split = open(path, 'w', encoding='utf-8', newline='') if path is not None else None
+    completed = False
+    try:
+        header = True
+        for chunk in pd.read_csv(f_in, delimiter=',', chunksize=chunksize):
+            df_split = clean_chunk(chunk)
+            if f_split is not None:
+                df_split.to_csv(f_split, header=header, index=False)
+                header = False
+            yield from df_split.to_dict('records')
+        completed = True
+    finally:
+        if f_split is not None:
+            f_split.close()
+        # f_in is only replaced by a complete file, a stream stopped early leaves it untouched
+        if path != f_out:
+            if completed:
+                os.replace(path, f_out)
+            else:
+                os.remove(path)
+
+
+def stream_keywords(f_in, chunksize=100000, f_out=None):
+    # Streaming version of keywords_cleaner: every cleaned keyword once, in order of appearance
+    seen = set()
+    for record in stream_records(f_in, chunksize, f_out):
+        keyword = record['keyword']
+        if keyword not in seen:
+            seen.add(keyword)
+            yield keyword
+
+
+# Words in parentheses, innermost first
+PARENTHESES = re.compile(r"\s*\([^()]*\)")
+# Words between brackets, with the spaces around them
+BRACKETS = re.compile(r"(\s*\[.*?\]\s*)")
+# Punctuation marks between keywords
+SEPARATORS = re.compile(r"[;,/]|\. |- | -")
+
+
+def split_keyword(keyword):
+    # Keywords in one cell: without parentheses, unclosed parentheses and brackets, split by punctuation marks
+    if not isinstance(keyword, str):
+        return []
+    keyword = PARENTHESES.sub("", keyword).strip().partition('(')[0]
+    keyword = BRACKETS.sub("", keyword).strip()
+    return [part for part in (word.strip() for word in SEPARATORS.split(keyword)) if part]
+
+
+def splitter(df, dtype=None):
+    """ Split multiple keywords in one row, one row per keyword.
+
+    Every distinct cell is split once, and the rows are repeated once per
+    keyword, keeping their original index. Rows without keywords are dropped.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Rows with a 'keyword' column.
+    dtype : str, optional
+        dtype of the resulting keyword column, e.g. 'string[pyarrow]'
+        (needs pyarrow). By default the column keeps object dtype.
+
+    Returns
+    -------
+    pandas.DataFrame
+    """
+    splits = {}
+    counts = []
+    keywords = []
+    for keyword in df['keyword'].tolist():
+        parts = splits.get(keyword) if isinstance(keyword, str) else None
+        if parts is None:
+            parts = split_keyword(keyword)
+            if isinstance(keyword, str):
+                splits[keyword] = parts
+        counts.append(len(parts))
+        keywords.extend(parts)
+
+    df = df.loc[df.index.repeat(counts)].copy()
+    df['keyword'] = pd.Series(keywords, index=df.index, dtype=dtype if dtype else object)
+
+    # Deletes empty values in the other columns, as the keywords
+    others = [column for column in df.columns if column != 'keyword']
+    df[others] = df[others].replace("", float("NaN"))
 
     return df
 
 
 # -------------- Build d_keys information --------------
-def process(clave):
+def process(clave, lemma=None, links=None):
     print('Processing {}'.format(clave))
     result = {'lang': language_keyword(clave)}
     output = {'keyword': clave, 'result': result}
@@ -296,46 +486,114 @@ def process(clave):
     # result['Group'] = group(clave, result['lang'])
 
     if result['lang'] == 'en':
-        # result['stop-word'] = en_stopWords(clave)
+        result['stop-word'] = en_stopWords(clave)
         # result['synonym'] = synonyms(clave)
         # result['stemmer'] = en_stemmer(clave)
-        result['lemmatizer'] = en_lemmatizer(clave)
-        result['Wikidata'] = WikidataLinker(result['lemmatizer'], result['lang'])
-        if result['Wikidata'] is None:
-            result['Wikidata'] = WikidataLinker(clave, result['lang'])
-
-        result['DBpedia'] = DBpediaLinker(result['lemmatizer'])
-        if result['DBpedia'] is None:
-            result['DBpedia'] = DBpediaLinker(clave)
+        result['lemmatizer'] = en_lemmatizer(clave) if lemma is None else lemma
 
     elif result['lang'] == 'es':
-        # result['stop-word'] = es_stopWords(clave)
+        result['stop-word'] = es_stopWords(clave)
         # result['synonym'] = synonyms(clave)
         # result['stemmer'] = es_stemmer(clave)
-        result['lemmatizer'] = es_lemmatizer(clave)
-        result['Wikidata'] = WikidataLinker(result['lemmatizer'], result['lang'])
-        if result['Wikidata'] is None:
-            result['Wikidata'] = WikidataLinker(clave, result['lang'])
-
-        result['DBpedia'] = DBpediaLinker(result['lemmatizer'])
-        if result['DBpedia'] is None:
-            result['DBpedia'] = DBpediaLinker(clave)
+        result['lemmatizer'] = es_lemmatizer(clave) if lemma is None else lemma
 
     elif result['lang'] == 'ca':
-        # result['stop-word'] = ca_stopWords(clave)
+        result['stop-word'] = ca_stopWords(clave)
         # result['synonym'] = synonyms(clave)
-        result['lemmatizer'] = ca_lemmatizer(clave)
-        result['Wikidata'] = WikidataLinker(result['lemmatizer'], result['lang'])
-        if result['Wikidata'] is None:
-            result['Wikidata'] = WikidataLinker(clave, result['lang'])
+        result['lemmatizer'] = ca_lemmatizer(clave) if lemma is None else lemma
 
-        result['DBpedia'] = DBpediaLinker(result['lemmatizer'])
-        if result['DBpedia'] is None:
-            result['DBpedia'] = DBpediaLinker(clave)
+    # Links already found (e.g. by the async linking engine or the seed) are not looked up again
+    result.update(link_keyword(clave, result['lemmatizer'], result['lang'], links))
 
     return output
 
 
+def process_task(task):
+    # process() for the pool: an error is returned instead of raised, so the other keywords go on
+    clave, lemma, links = task
+    try:
+        return process(clave, lemma, links)
+    except Exception as e:
+        return {'keyword': clave, 'error': '{}: {}'.format(type(e).__name__, e)}
+
+
+def collect_results(d_key, outputs, store, resumed=(), representative=None, lemmas=None):
+    """ Put the results of the pool in d_key, checkpointing them as they arrive.
+
+    Parameters
+    ----------
+    d_key : dict
+        Keywords of the run, updated in place. Keywords that failed, and the
+        variants whose representative failed, are deleted from it: they have
+        no result and are processed again with --resume.
+    outputs : iterable of dict
+        process_task outputs, in any order.
+    store : CheckpointStore
+        Store where every result or failure is added.
+    resumed : iterable of str
+        Keywords whose result was already in d_key, taken from the store.
+    representative : dict, optional
+        Keyword -> keyword representing its group of variants.
+    lemmas : dict, optional
+        Lemma of every keyword.
+
+    Returns
+    -------
+    dict
+        Mapping keyword -> error of the keywords that failed.
+    """
+    processed = {}
+    failed = {}
+    for output in outputs:
+        if 'error' in output:
+            failed[output['keyword']] = output['error']
+            store.add_failure(output['keyword'], output['error'])
+            continue
+        processed[output['keyword']] = KeywordResult.from_dict(output['result'])
+        store.add(output['keyword'], output['result'])
+
+    succeeded = set(resumed) | set(processed)
+    representative = representative or {}
+    lemmas = lemmas or {}
+    # Same order as the keywords, whatever order they finished in
+    for keyword in list(d_key):
+        rep = representative.get(keyword, keyword)
+        if keyword in processed:
+            d_key[keyword] = processed[keyword]
+        elif rep != keyword and rep in succeeded:
+            # Variants take the links of the keyword that represents their group
+            rep_result = processed[rep] if rep in processed else d_key[rep]
+            d_key[keyword] = KeywordResult.from_dict(variant_result(keyword, lemmas.get(keyword), rep_result))
+        elif keyword not in succeeded:
+            del d_key[keyword]
+    return failed
+
+
+def link_keyword(clave, lemma, lang, links=None):
+    # Link the lemma of the keyword, or the keyword itself when the lemma has no link,
+    # in the endpoints without a link in links
+    links = dict(links) if links is not None else {}
+    if 'Wikidata' not in links:
+        links['Wikidata'] = WikidataLinker(lemma, lang)
+        if links['Wikidata'] is None:
+            links['Wikidata'] = WikidataLinker(clave, lang)
+
+    if 'DBpedia' not in links:
+        links['DBpedia'] = DBpediaLinker(lemma)
+        if links['DBpedia'] is None:
+            links['DBpedia'] = DBpediaLinker(clave)
+
+    return links
+
+
+def variant_result(clave, lemma, result):
+    # Result of a morphological variant that reuses the links of its group representative
+    variant = dict(result)
+    variant['lemmatizer'] = lemma
+    variant['stop-word'] = remove_stopwords(clave, result['lang'])
+    return variant
+
+
 def statistics_d_keys(dict_in):
     multi_cont = 0
     one_cont = 0
@@ -356,78 +614,46 @@ def statistics_d_keys(dict_in):
 
 
 # -------------- Modify file replace-keywords-uri.csv --------------
-def modify_file_keywords_to_uri(dict):
-    file = "../files/file-keywords-split.csv"
-    file2 = "../files/replace-keywords-uri.csv"
-    with open(file, "r") as csv_file, open(file2, "w", encoding='utf-8') as csv_file_out:
-        headers = next(csv_file, None)  # Write header
-        if headers:
-            csv_file_out.write(headers)
-        for lane in csv_file:
-            part = lane.rstrip().split(",")  # Split elements by coma
-            resourcer = part[0]
-            key = normalize(part[1])  # Get the first element
-
-            # Replace keywords for uris
-            if key in dict.keys():
-                if dict[key]['Wikidata'] is not None:
-                    f_key = key.replace(key, dict[key]['Wikidata'])
-                    csv_file_out.write('{},{}\n'.format(resourcer, f_key))
-                else:
-                    if dict[key]['DBpedia'] is not None:
-                        f_key = key.replace(key, dict[key]['DBpedia'])
-
-                        # Check uri with coma to be read correctly by file
-                        if "," in f_key:
-                            f_key_q = '"' + f_key + '"'
-                            csv_file_out.write('{},{}\n'.format(resourcer, f_key_q))
-                        else:
-                            csv_file_out.write('{},{}\n'.format(resourcer, f_key))
-
-            else:
-                csv_file_out.write('{},{}\n'.format(resourcer, key))
+def modify_file_keywords_to_uri(dict, file="../files/file-keywords-split.csv",
+                                file2="../files/replace-keywords-uri.csv"):
+    # Replace every keyword of the split file by its uri (Wikidata first, DBpedia otherwise)
+    df = pd.read_csv(file, delimiter=',', dtype=str, keep_default_na=False)
+    resource, keyword = df.columns[:2]
+
+    # Normalize and join every distinct keyword once
+    codes, keywords = pd.factorize(df[keyword])
+    keys = pd.DataFrame({'key': pd.Series(keywords, dtype=object).str.lower().str.strip()
+                                                                  .str.replace(r"\s\s+", " ", regex=True)})
+    uris = pd.DataFrame({'key': list(dict.keys()),
+                         'uri': [v['Wikidata'] if v['Wikidata'] is not None else v['DBpedia']
+                                 for v in dict.values()]})
+    keys = keys.merge(uris, on='key', how='left', indicator=True)
+
+    # Keywords without any uri are deleted, keywords not processed are kept as they are
+    linked = (keys['_merge'] == 'both').to_numpy()
+    replaced = keys['uri'].where(linked, keys['key']).to_numpy()
+    keep = (~linked | keys['uri'].notna().to_numpy())[codes]
+
+    with open(file2, 'w', encoding='utf-8', newline='') as csv_file_out:
+        writer = csv.writer(csv_file_out, lineterminator='\n')
+        writer.writerow([resource, keyword])
+        writer.writerows(zip(df[resource].to_numpy()[keep], replaced[codes][keep]))
 
 
 # -------------- Buid comp_keys information --------------
-def create_comp_dict(keyword, dict_out, dict_comp):
-    db = dict_comp[keyword]['DBpedia']
-    wd = dict_comp[keyword]['Wikidata']
-
-    if wd:
-        dict_out[wd] = [{'keyword': keyword, 'language': dict_comp[keyword]['lang']}]
-        wrapper = Wikidata_wrapper(wd)
-        dict_out[wd].extend(wrapper)
-    else:
-        dict_out[db] = [{'keyword': keyword, 'language': dict_comp[keyword]['lang']}]
-        wrapper = DBpedia_wrapper(db)
-        dict_out[db].extend(wrapper)
-        if db is None:
-            dict_out.pop(keyword, None)
-
-    # Delete None keys
-    for k in list(dict_out):
-        if k is None:
-            dict_out.pop(k)
-
-    # Clean repeated labels
-    clean_repeated_labels(dict_out)
-
-    return dict_out
-
+def fetch_labels(dict_comp, chunk_size=200, index=None):
+    # Labels of every uri of d_key, with one SPARQL query per chunk of uris or from the offline index
+    wd_uris = [v['Wikidata'] for v in dict_comp.values() if v['Wikidata']]
+    db_uris = [v['DBpedia'] for v in dict_comp.values() if not v['Wikidata'] and v['DBpedia']]
 
-def clean_repeated_labels(dict_out):
-    for key, value in list(dict_out.items()):
-        labels_list = []
-        for item in value:
-            if item not in labels_list:
-                labels_list.append(item)
-        dict_out[key] = labels_list
+    if index is not None:
+        labels = {uri: Wikidata_offline_wrapper(uri, index) for uri in wd_uris}
+        labels.update({uri: DBpedia_offline_wrapper(uri, index) for uri in db_uris})
+        return labels
 
-        # Delete words with just one label
-        if len(dict_out[key]) == 1:
-            dict_out.pop(key, None)
-
-    return dict_out
+    labels = Wikidata_batch_wrapper(wd_uris, chunk_size)
+    labels.update(DBpedia_batch_wrapper(db_uris, chunk_size))
+    return labels
 
 
 def statistics_comp_keys(dict_in):
@@ -463,22 +689,116 @@ def create_compacting_keys_structure(dict):
 
 
 def compare_resource_keywords_uri(file1, dict):
-    # Convert the file into dataframe to make changes and skiped uris cant be read by csv
-    df_file = pd.read_csv(file1, delimiter=',')
+    # Keep only the rows whose uri is in the final dictionary, and only once
+    df_file = pd.read_csv(file1, delimiter=',', dtype=str, keep_default_na=False)
 
-    # Check if file contains the same uris as final dictionary
-    for u in df_file['keyword']:
-        if u not in dict.keys():
-            badwords = df_file[df_file['keyword'] == u].index
-            df_file.drop(badwords, inplace=True)
+    df_file = df_file[df_file['keyword'].isin(set(dict.keys()))]
 
     df_file.drop_duplicates(subset=None, keep="first", inplace=True)
-    df_file.reset_index(drop=True)
     df_file.to_csv(file1, index=False)
 
 
+def compare_resource_keywords_uri_stream(file1, dict, file_out=None, chunksize=100000):
+    """ compare_resource_keywords_uri for files that don't fit in memory.
+
+    The file is filtered in blocks of chunksize rows and written to
+    file_out, or back to file1 through a temporary file. Only the distinct
+    rows that are kept are held in memory, to remove duplicates across blocks.
+    """
+    file_out = file_out or file1
+    path = file_out + '.tmp' if file_out == file1 else file_out
+    uris = set(dict.keys())
+    seen = set()
+
+    with open(path, 'w', encoding='utf-8', newline='') as f_out:
+        header = True
+        for chunk in pd.read_csv(file1, delimiter=',', dtype=str, keep_default_na=False, chunksize=chunksize):
+            # isin would hash the whole set of uris again for every block
+            chunk = chunk[[uri in uris for uri in chunk['keyword'].tolist()]].drop_duplicates(keep="first")
+            rows = list(zip(*(chunk[column].tolist() for column in chunk.columns)))
+            new = [row not in seen for row in rows]
+            seen.update(rows)
+            chunk[new].to_csv(f_out, header=header, index=False)
+            header = False
+
+    if path != file_out:
+        os.replace(path, file_out)
+
+
 # -------------- Data serialization --------------
-def serialization(dict1, dict2):
+def read_researcher_terms(file="../files/replace-keywords-uri.csv"):
+    # {'researcher', 'term'} pairs of replace-keywords-uri.csv, read one row at a time
+    with open(file, mode='r', encoding='utf-8') as file_in:
+        reader = csv.reader(file_in, quoting=csv.QUOTE_ALL)
+        next(reader, None)  # Ignore first lane
+        for lane in reader:
+            # Delete quotes of words of file to serialize
+            yield {'researcher': lane[0], 'term': lane[1].replace('"', "")}
+
+
+def stream_serialization(dict1, dict2, destination="../files/researchers_areas.ttl", format="turtle"):
+    """ Serialize the researchers and the concepts writing the triples as they are built.
+
+    Same triples as serialization, written with rdf_writer instead of an
+    rdflib Graph, so the memory used doesn't depend on the size of the output.
+
+    Parameters
+    ----------
+    dict1 : iterable of dict
+        {'researcher', 'term'} pairs, e.g. read_researcher_terms().
+    dict2 : mapping
+        Compacted labels by uri (com_keys).
+    destination : str
+        File to write.
+    format : str
+        'turtle' or 'nt' (N-Triples).
+
+    Returns
+    -------
+    int
+        Number of triples written.
+    """
+    with open(destination, 'w', encoding='utf-8', newline='\n') as f_out:
+        return write_rdf(dict1, dict2, f_out, format=format)
+
+
+def sharded_serialization(dict1, dict2, destination="../files/researchers_areas.ttl", format="turtle", shards=4,
+                          processes=None, shard_dir=None):
+    """ Serialize the researchers and the concepts in shards written by a process pool.
+
+    The shards are merged into one sorted file, the same for every run with
+    the same triples, or left in shard_dir with their manifest.
+
+    Parameters
+    ----------
+    dict1 : iterable of dict
+        {'researcher', 'term'} pairs, e.g. read_researcher_terms().
+    dict2 : mapping
+        Compacted labels by uri (com_keys).
+    destination : str
+        File to write the merged shards to, not used with shard_dir.
+    format : str
+        'turtle' or 'nt' (N-Triples).
+    shards : int
+        Number of shards.
+    processes : int, optional
+        Processes of the pool. Defaults to the number of shards.
+    shard_dir : str, optional
+        Directory where the shards and manifest.json are left without merging.
+
+    Returns
+    -------
+    int
+        Number of triples written.
+    """
+    if shard_dir is not None:
+        return write_shards(dict1, dict2, shard_dir, format, shards, processes)['triples']
+    with tempfile.TemporaryDirectory() as directory:
+        write_shards(dict1, dict2, directory, format, shards, processes)
+        return merge_shards(directory, destination)
+
+
+def serialization(dict1, dict2, destination="../files/researchers_areas.ttl"):
     rdf = Graph()
     namespace_manager = NamespaceManager(rdf)
     namespace_manager.bind("skos", SKOS)
@@ -506,7 +826,7 @@ def serialization(dict1, dict2):
     print(rdf.serialize(format="turtle", encoding="UTF-8").decode("utf-8"))
 
     # Serialize to a file
-    rdf.serialize(destination="../files/researchers_areas.ttl", format="turtle")
+    rdf.serialize(destination=destination, format="turtle")
 
 
 # ------------------------------------------
@@ -515,9 +835,58 @@ def serialization(dict1, dict2):
 
 if __name__ == '__main__':
 
-    entrada = "../files/samples_researchers_publications-keywords.csv"
-    #entrada = "../files/Researcher-06000001-keywords.csv"
-    salida = "../files/file-keywords-split.csv"
+    parser = argparse.ArgumentParser(description="Link, compact and serialize the keywords of the researchers")
+    parser.add_argument('--input', default="../files/samples_researchers_publications-keywords.csv",
+                        help="researcher/keyword CSV file (e.g. ../files/Researcher-06000001-keywords.csv)")
+    parser.add_argument('--split-file', default="../files/file-keywords-split.csv",
+                        help="file where the cleaned and split keywords are written")
+    parser.add_argument('--group-file', default="../files/group_index.json")
+    parser.add_argument('--cache-file', default="../files/link_cache.sqlite")
+    parser.add_argument('--index-file', default=None,
+                        help="offline label index built with offline_index.py, instead of the public endpoints")
+    parser.add_argument('--collapse-variants', action='store_true',
+                        help="link only one keyword of each group of morphological variants")
+    parser.add_argument('--async-linking', action='store_true',
+                        help="link the keywords with the asyncio engine instead of inside the pool workers")
+    parser.add_argument('--batch-spotlight', action='store_true',
+                        help="annotate the keywords with DBpedia Spotlight in batches before linking them")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="read the keywords file in blocks of this many rows instead of at once")
+    parser.add_argument('--seed-file', default=None,
+                        help="compacting output of a previous run (.csv or .arrow), e.g. ../files/compacting_keys.csv:"
+                             " the keywords it linked are not linked again in its endpoint")
+    parser.add_argument('--checkpoint', default="../files/checkpoint.jsonl",
+                        help="append-only store of the processed keywords of every run")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--resume', action='store_true',
+                      help="continue the last run, skipping the keywords it already processed")
+    mode.add_argument('--delta', action='store_true',
+                      help="only process the keywords not processed by any previous run")
+    parser.add_argument('--compacting-file', default="../files/compacting_keys.arrow",
+                        help="Arrow IPC copy of compacting_keys.csv, read with compact_store.read_compacting_keys")
+    parser.add_argument('--rdf-file', default="../files/researchers_areas.ttl")
+    parser.add_argument('--rdf-format', choices=['turtle', 'nt', 'rdflib'], default='turtle',
+                        help="stream the triples as Turtle or N-Triples, or build an rdflib graph (turtle)")
+    parser.add_argument('--rdf-shards', type=int, default=None,
+                        help="serialize the triples in this many shards in parallel and merge them sorted")
+    parser.add_argument('--rdf-shard-dir', default=None,
+                        help="leave the shards and their manifest in this directory instead of merging them")
+    args = parser.parse_args()
+    if args.rdf_shards is not None and args.rdf_shards < 1:
+        parser.error("--rdf-shards must be at least 1")
+    if (args.rdf_shards is not None or args.rdf_shard_dir) and args.rdf_format == 'rdflib':
+        parser.error("--rdf-shards and --rdf-shard-dir need --rdf-format turtle or nt")
+
+    entrada = args.input
+    salida = args.split_file
+    group_file = args.group_file
+    cache_file = args.cache_file
+    index_file = args.index_file
+    collapse_variants = args.collapse_variants
+    async_linking = args.async_linking
+    batch_spotlight = args.batch_spotlight
+    chunksize = args.chunksize
+    seed_file = args.seed_file
 
     # Generate a new file with same data but this time without quote marks
     correct_keywords_file(entrada, salida)
@@ -525,7 +894,10 @@ if __name__ == '__main__':
     start = time.time()
 
     # Clean file and organize keywords to be processed
-    kw_cleaned = keywords_cleaner(salida)
+    if chunksize:
+        kw_cleaned = stream_keywords(salida, chunksize, f_out=salida)
+    else:
+        kw_cleaned = keywords_cleaner(salida)
 
     # --------------------- Dictionary keyword information structure ---------------------
     d_key = {}
@@ -533,20 +905,77 @@ if __name__ == '__main__':
         k_norm = normalize(k)
         d_key[k_norm] = {}
 
-    pool = multiprocessing.Pool()
+    # Lemmatize all the keywords in batches before linking them
+    lemmas = lemmatize_keywords(list(d_key.keys()))
+
+    # Group the keywords by root, reusing the index of previous runs
+    groups = GroupIndex.load(group_file)
+    keyword_languages = dict(zip(d_key.keys(), detect_languages(d_key.keys())))
+    groups.add(list(keyword_languages), list(keyword_languages.values()), lemmas)
+    groups.save(group_file)
+
+    if collapse_variants:
+        representative = groups.representatives(d_key.keys())
+    else:
+        representative = {k: k for k in d_key.keys()}
+    to_link = [k for k in d_key.keys() if representative[k] == k]
+
+    # Keywords processed by the resumed run, or by any run in delta mode, are not processed again
+    store = CheckpointStore.resume(args.checkpoint) if args.resume else CheckpointStore(args.checkpoint)
+    done = {}
+    if args.resume:
+        done = store.results(store.run_id)
+    elif args.delta:
+        done = store.results()
+    resumed = [k for k in to_link if k in done]
+    for k in resumed:
+        d_key[k] = KeywordResult.from_dict(done[k])
+    to_link = [k for k in to_link if k not in done]
+    print("Keywords already processed: {}, to process: {}".format(len(resumed), len(to_link)))
+
+    # Keywords linked by a previous run take that link from the seed dictionary, the other endpoint is linked as usual
+    links = {}
+    if seed_file:
+        seed = SeedDictionary.load(seed_file, "../files/replace-keywords-uri.csv")
+        for k in to_link:
+            seed_links = seed.link(k, lemmas.get(k))
+            if seed_links is not None:
+                links[k] = seed_links
+        print("Keywords found in the seed dictionary: {}/{}".format(len(links), len(to_link)))
+    unseeded = [k for k in to_link if k not in links]
+
+    if batch_spotlight and not index_file:
+        # The links are left in the persistent cache, where the workers find them
+        no_dbpedia = [k for k in to_link if 'DBpedia' not in links.get(k, {})]
+        texts = [lemmas.get(k, k) for k in no_dbpedia] + no_dbpedia
+        DBPediaEntityLinker(cache=LinkCache(cache_file)).link_entities_batch(texts)
+
+    if async_linking and not index_file:
+        linker = AsyncEntityLinker(cache=LinkCache(cache_file))
+        links.update(linker.run({k: (language_keyword(k), lemmas.get(k)) for k in unseeded}))
+
+    # Workers load the spaCy pipelines of the languages of the keywords they are going to process
+    worker_languages = tuple(lang for lang in SPACY_MODELS if lang in {keyword_languages[k] for k in to_link})
+    pool = multiprocessing.Pool(initializer=init_worker, initargs=(worker_languages, cache_file, index_file))
     try:
-        result_async = [pool.apply_async(process, args=(keyword,)) for keyword in d_key.keys()]
-        for o in result_async:
-            output = o.get()
-            d_key[output['keyword']] = output['result']
+        # Every result is checkpointed as soon as it's done, and a failed keyword doesn't stop the others
+        tasks = [(keyword, lemmas.get(keyword), links.get(keyword)) for keyword in to_link]
+        failed = collect_results(d_key, pool.imap_unordered(process_task, tasks), store, resumed,
+                                 representative, lemmas)
+        if failed:
+            print("Keywords failed: {}, processed again with --resume".format(len(failed)))
+            for keyword, error in failed.items():
+                print("  {}: {}".format(keyword, error))
 
         print("--------------------------------------------")
         print("------ INFORMATION KEYWORDS STRUCTURE ------")
         print("--------------------------------------------")
-        print(json.dumps(d_key, indent=1, ensure_ascii=False).encode('utf-8').decode())
+        print(json.dumps(d_key, indent=1, ensure_ascii=False, default=to_builtin).encode('utf-8').decode())
     finally:
         end = time.time()
         pool.close()
+        # Keep every keyword processed so far, even if the run was interrupted
+        store.close()
 
     # Statistics of dictionary
     statistics_d_keys(d_key)
@@ -554,30 +983,34 @@ if __name__ == '__main__':
     print('Elapsed: {}'.format(time.strftime("%Hh:%Mm:%Ss", time.gmtime(end - start))))
 
     # File modifier to resource/uri
-    modify_file_keywords_to_uri(d_key)
+    modify_file_keywords_to_uri(d_key, salida, "../files/replace-keywords-uri.csv")
 
     # --------------------- Compacting keyword dictionary ---------------------
     start2 = time.time()
 
-    com_keys = {}
+    labels = fetch_labels(d_key, index=LabelIndex(index_file) if index_file else None)
+    compaction = CompactingKeys(lambda uri: labels.get(uri, []))
     loop = tqdm(total=len(d_key.keys()), position=0, leave=False, colour='green')
 
     for k in d_key.keys():
         k_norm2 = normalize(k)
         loop.set_description("Building compacting keys dictionary".format(k))
 
-        # Create content of dictionary
-        com_keys = create_comp_dict(k_norm2, com_keys, d_key)
+        # Add the keyword and the labels of its uri
+        compaction.add_result(k_norm2, d_key[k])
 
         loop.update(1)
     loop.close()
 
+    # Uris with a single label are not compacted
+    com_keys = compaction.finalize()
+
     end2 = time.time()
 
     print("-------------------------------------------")
     print("------ COMPACTING KEYWORDS STRUCTURE ------")
     print("-------------------------------------------")
-    print(json.dumps(com_keys, indent=1, ensure_ascii=False).encode('utf-8').decode())
+    print(json.dumps(com_keys, indent=1, ensure_ascii=False, default=to_builtin).encode('utf-8').decode())
 
     # Statistics
     statistics_comp_keys(com_keys)
@@ -588,25 +1021,22 @@ if __name__ == '__main__':
     file1 = "../files/replace-keywords-uri.csv"
     compare_resource_keywords_uri(file1, com_keys)
 
-    # Create file with keywords compacted
+    # Create file with keywords compacted, and its columnar copy for the loaders
     create_compacting_keys_structure(com_keys)
+    write_compacting_keys(com_keys, args.compacting_file)
 
     # --------------------- SKOS serialization ---------------------
-    researcher_terms = []
-    # Create new dictionary with file content of replace-keywords-uri.csv
-    with open('../files/replace-keywords-uri.csv', mode='r') as file_in:
-        reader = csv.reader(file_in, quoting=csv.QUOTE_ALL)
-        next(reader)  # Ignore first lane
-        for lane in reader:
-            researcher = lane[0]
-            term = lane[1]
-
-            # Delete quotes of words of file to serialize
-            if '"' in term:
-                term_clean = term.replace('"', "")
-                researcher_terms.append({'researcher': researcher, 'term': term_clean})
-            else:
-                researcher_terms.append({'researcher': researcher, 'term': term})
+    # Researcher and term of every lane of replace-keywords-uri.csv
+    researcher_terms = read_researcher_terms('../files/replace-keywords-uri.csv')
 
     # Serialize results of dictionaries created with final results
-    serialization(researcher_terms, com_keys)
+    if args.rdf_format == 'rdflib':
+        serialization(list(researcher_terms), com_keys, args.rdf_file)
+    elif args.rdf_shards is not None or args.rdf_shard_dir:
+        shards = args.rdf_shards if args.rdf_shards is not None else 4
+        triples = sharded_serialization(researcher_terms, com_keys, args.rdf_file, args.rdf_format,
+                                        shards, shard_dir=args.rdf_shard_dir)
+        print("{} triples written to {}".format(triples, args.rdf_shard_dir or args.rdf_file))
+    else:
+        triples = stream_serialization(researcher_terms, com_keys, args.rdf_file, args.rdf_format)
+        print("{} triples written to {}".format(triples, args.rdf_file))
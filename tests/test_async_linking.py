@@ -0,0 +1,109 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from async_linking import AsyncEntityLinker, TokenBucket
+from http_client import retry_after_seconds
+from fake_endpoints import FakeEndpoints
+from link_cache import LinkCache
+from test_fake_endpoints import FIXTURES, point_to, set_endpoints
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_rate(self):
+        async def take(bucket, n):
+            for _ in range(n):
+                await bucket.acquire()
+
+        bucket_start = time.monotonic()
+        asyncio.run(take(TokenBucket(20, capacity=1), 11))
+        elapsed = time.monotonic() - bucket_start
+
+        self.assertGreaterEqual(elapsed, 0.45)
+
+    def test_retry_after_seconds(self):
+        self.assertEqual(retry_after_seconds("3", 5), 3.0)
+        self.assertEqual(retry_after_seconds(None, 5), 5)
+        self.assertEqual(retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT", 5), 0.0)
+        self.assertEqual(retry_after_seconds("soon", 5), 5)
+
+
+class TestAsyncEntityLinker(unittest.TestCase):
+
+    def link(self, keywords, **kwargs):
+        with FakeEndpoints(FIXTURES, **kwargs.pop('server', {})) as server:
+            previous = point_to(server.url)
+            try:
+                links = AsyncEntityLinker(**kwargs).run(keywords)
+            finally:
+                set_endpoints(*previous)
+        return links, server
+
+    def test_link_keywords(self):
+        keywords = {'e-learning': ('en', 'e-learning'),
+                    'cloud computing': ('en', 'cloud computing'),
+                    'usabilidad': ('es', None),
+                    'wilkomen': ('en', 'wilkomen')}
+        links, _ = self.link(keywords)
+
+        self.assertEqual(links['e-learning'], {'Wikidata': 'http://www.wikidata.org/entity/Q1068473',
+                                               'DBpedia': 'http://dbpedia.org/resource/Educational_technology'})
+        self.assertEqual(links['cloud computing'], {'Wikidata': 'http://www.wikidata.org/entity/Q483639',
+                                                    'DBpedia': 'http://dbpedia.org/resource/Cloud_computing'})
+        self.assertEqual(links['usabilidad'], {'Wikidata': 'http://www.wikidata.org/entity/Q216378',
+                                               'DBpedia': None})
+        self.assertEqual(links['wilkomen'], {'Wikidata': None, 'DBpedia': None})
+
+    def test_lemma_fallback(self):
+        links, server = self.link({'e-learning': ('en', 'e-learn')})
+
+        self.assertEqual(links['e-learning']['Wikidata'], 'http://www.wikidata.org/entity/Q1068473')
+        self.assertEqual(server.requests['wbsearchentities'], 2)
+
+    def test_concurrent(self):
+        keywords = {'keyword {}'.format(i): ('en', None) for i in range(40)}
+        start = time.monotonic()
+        links, _ = self.link(keywords, rate_limits={'wikidata': 1000, 'spotlight': 1000},
+                             server={'latency': 0.2})
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(len(links), 40)
+        # 80 requests of 0.2 seconds each, far less than their sum when run concurrently
+        self.assertLess(elapsed, 4)
+
+    def test_retry_after(self):
+        start = time.monotonic()
+        links, server = self.link({'cloud computing': ('en', None)},
+                                  server={'throttle_first': 1, 'retry_after': 1})
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(links['cloud computing']['DBpedia'], 'http://dbpedia.org/resource/Cloud_computing')
+        self.assertEqual(server.throttled_requests['annotate'], 1)
+        self.assertGreaterEqual(elapsed, 1)
+
+    def test_retries_exhausted(self):
+        links, _ = self.link({'cloud computing': ('en', None)}, max_retries=1, throttling_time=0,
+                             server={'throttle_rate': 1.0})
+
+        self.assertEqual(links['cloud computing'], {'Wikidata': None, 'DBpedia': None})
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as directory, FakeEndpoints(FIXTURES) as server:
+            cache = LinkCache(os.path.join(directory, 'links.sqlite'))
+            previous = point_to(server.url)
+            try:
+                AsyncEntityLinker(cache=cache).run({'cloud computing': ('en', None)})
+                sent = sum(server.requests.values())
+                links = AsyncEntityLinker(cache=cache).run({'cloud computing': ('en', None)})
+            finally:
+                set_endpoints(*previous)
+                cache.close()
+
+        self.assertEqual(links['cloud computing']['Wikidata'], 'http://www.wikidata.org/entity/Q483639')
+        self.assertEqual(sum(server.requests.values()), sent)
+
+if __name__ == '__main__':
+    unittest.main()
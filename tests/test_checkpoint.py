@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+
+from checkpoint import CheckpointStore
+
+RESULT = {'lang': 'en', 'stop-word': 'cloud computing', 'lemmatizer': 'cloud computing',
+          'Wikidata': 'http://www.wikidata.org/entity/Q483639', 'DBpedia': None}
+
+
+class TestCheckpointStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'checkpoint.jsonl')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_empty(self):
+        store = CheckpointStore(self.path)
+
+        self.assertEqual(store.results(), {})
+        self.assertIsNone(store.last_run())
+
+    def test_add(self):
+        with CheckpointStore(self.path) as store:
+            store.add('cloud computing', RESULT)
+            store.add('computación en la nube', dict(RESULT, lang='es'))
+
+        results = CheckpointStore(self.path).results()
+        self.assertEqual(results['cloud computing'], RESULT)
+        self.assertEqual(results['computación en la nube']['lang'], 'es')
+
+    def test_flush_every(self):
+        store = CheckpointStore(self.path, flush_every=2)
+        store.add('cloud computing', RESULT)
+        store.add('e-learning', RESULT)
+        store.add('usability', RESULT)
+
+        # Flushed keywords are on disk before the store is closed
+        self.assertEqual(set(CheckpointStore(self.path).results()), {'cloud computing', 'e-learning'})
+        store.close()
+        self.assertEqual(len(CheckpointStore(self.path).results()), 3)
+
+    def test_runs(self):
+        with CheckpointStore(self.path, run_id='run1') as store:
+            store.add('cloud computing', RESULT)
+            store.add('e-learning', RESULT)
+        with CheckpointStore(self.path, run_id='run2') as store:
+            store.add('cloud computing', dict(RESULT, DBpedia='http://dbpedia.org/resource/Cloud_computing'))
+
+        store = CheckpointStore(self.path)
+        self.assertEqual(store.runs(), ['run1', 'run2'])
+        self.assertEqual(set(store.results('run2')), {'cloud computing'})
+        # The latest result of a keyword wins
+        self.assertEqual(store.results()['cloud computing']['DBpedia'], 'http://dbpedia.org/resource/Cloud_computing')
+
+    def test_resume(self):
+        with CheckpointStore(self.path, run_id='run1') as store:
+            store.add('cloud computing', RESULT)
+
+        with CheckpointStore.resume(self.path) as store:
+            self.assertEqual(store.run_id, 'run1')
+            store.add('e-learning', RESULT)
+
+        self.assertEqual(set(CheckpointStore(self.path).results('run1')), {'cloud computing', 'e-learning'})
+
+    def test_cut_line(self):
+        with CheckpointStore(self.path, run_id='run1') as store:
+            store.add('cloud computing', RESULT)
+        with open(self.path, 'a', encoding='utf-8') as f_out:
+            f_out.write('{"run": "run1", "keyword": "e-lea')
+
+        with CheckpointStore.resume(self.path) as store:
+            store.add('usability', RESULT)
+
+        self.assertEqual(set(CheckpointStore(self.path).results()), {'cloud computing', 'usability'})
+
+    def test_failures(self):
+        with CheckpointStore(self.path, run_id='run1') as store:
+            store.add('cloud computing', RESULT)
+            store.add_failure('e-learning', 'HTTPError: 503 Server Error')
+            store.add_failure('usability', 'HTTPError: 503 Server Error')
+
+        # Failed keywords have no result, so a resumed run processes them again
+        self.assertEqual(set(CheckpointStore(self.path).results('run1')), {'cloud computing'})
+
+        with CheckpointStore.resume(self.path) as store:
+            store.add('e-learning', RESULT)
+
+        store = CheckpointStore(self.path)
+        self.assertEqual(set(store.results()), {'cloud computing', 'e-learning'})
+        self.assertEqual(store.failures(), {'usability': 'HTTPError: 503 Server Error'})
+
+
+if __name__ == '__main__':
+    unittest.main()
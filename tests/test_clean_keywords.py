@@ -1,7 +1,12 @@
 import unittest
 
 import pandas as pd
+import importlib.util
 import io
+import os
+import shutil
+import tempfile
+from unittest import mock
 from src import tfg_nlp
 
 
@@ -55,6 +60,29 @@ class SimpleTestFileKeywordsSplit(unittest.TestCase):
 
         self.assertEqual(tfg_nlp.language_keyword(actual), expected)
 
+    def test_detect_languages(self):
+        keywords = ["evidence", "actualidad", "igualtat", "Evidence "]
+        expected = ['en', 'es', 'ca', 'en']
+
+        self.assertEqual(tfg_nlp.detect_languages(keywords), expected)
+
+    def test_detect_languages_low_confidence(self):
+        keywords = ["actualidad", "igualtat"]
+        expected = ['en', 'en']
+
+        self.assertEqual(tfg_nlp.detect_languages(keywords, min_confidence=101), expected)
+
+    def test_detect_language_cached(self):
+        tfg_nlp.detect_language("Actualidad")
+
+        self.assertIn("actualidad", tfg_nlp.language_cache)
+
+    def test_detect_languages_accents(self):
+        keywords = ["Informàtica en núvol", "computación en la nube", "investigació en intel·ligència artificial"]
+        expected = ['ca', 'es', 'ca']
+
+        self.assertEqual(tfg_nlp.detect_languages(keywords), expected)
+
     def test_en_stopwords(self):
         sentence = "This is a sample sentence, showing off the stop words filtration."
         result = ['This', 'sample', 'sentence', ',', 'showing', 'stop', 'words', 'filtration', '.']
@@ -97,6 +125,34 @@ class SimpleTestFileKeywordsSplit(unittest.TestCase):
         print("Lemma de %s es: %s" % (keyword, tfg_nlp.ca_lemmatizer(keyword)))
         self.assertEqual(tfg_nlp.ca_lemmatizer(keyword), results["result"]["lemmatizer"])
 
+    def test_load_nlp_once(self):
+        nlp = tfg_nlp.load_nlp('en')
+
+        self.assertIs(tfg_nlp.load_nlp('en'), nlp)
+
+    def test_init_worker_languages(self):
+        # The pipelines of the given languages are loaded once, when the worker starts
+        loaded = []
+        previous = dict(tfg_nlp.nlp_models)
+        tfg_nlp.nlp_models.clear()
+        try:
+            with mock.patch.object(tfg_nlp.spacy, 'load', side_effect=lambda name, disable: loaded.append(name)):
+                tfg_nlp.init_worker(('en', 'ca'))
+                tfg_nlp.load_nlp('en')
+            self.assertEqual(loaded, [tfg_nlp.SPACY_MODELS['en'], tfg_nlp.SPACY_MODELS['ca']])
+            self.assertEqual(set(tfg_nlp.nlp_models), {'en', 'ca'})
+        finally:
+            tfg_nlp.nlp_models.clear()
+            tfg_nlp.nlp_models.update(previous)
+
+    def test_lemmatize_keywords(self):
+        keywords = ["city", "ciudades", "investigació"]
+        lemmas = tfg_nlp.lemmatize_keywords(keywords, batch_size=2)
+
+        self.assertEqual(tfg_nlp.en_lemmatizer("city"), lemmas["city"])
+        self.assertEqual(tfg_nlp.es_lemmatizer("ciudades"), lemmas["ciudades"])
+        self.assertEqual(tfg_nlp.ca_lemmatizer("investigació"), lemmas["investigació"])
+
 
 class ComplexTestFileKeywordsSplit(unittest.TestCase):
 
@@ -196,6 +252,60 @@ class ComplexTestFileKeywordsSplit(unittest.TestCase):
         with io.open(file_out) as f_out, io.open(expected_file) as expected:
             self.assertListEqual(list(f_out), list(expected))
 
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_arrow_strings(self):
+        file_in = "files/parentheses/parentheses_example.csv"
+        expected_file = "files/parentheses/expected_parentheses.csv"
+
+        df = pd.read_csv(file_in, delimiter=',')
+        df_split = tfg_nlp.splitter(df, dtype='string[pyarrow]')
+
+        self.assertEqual(str(df_split['keyword'].dtype), 'string')
+        with io.open(expected_file) as expected:
+            self.assertListEqual(df_split.to_csv(index=False).splitlines(True), list(expected))
+
+
+class TestStreamingKeywords(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.file_in = os.path.join(self.directory.name, "stream_example.csv")
+        shutil.copy("files/stream/stream_example.csv", self.file_in)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_stream_keywords(self):
+        file_out = os.path.join(self.directory.name, "stream_result.csv")
+        keywords = list(tfg_nlp.stream_keywords(self.file_in, chunksize=2, f_out=file_out))
+
+        self.assertEqual(keywords, tfg_nlp.keywords_cleaner(self.file_in))
+        # Keywords repeated in other blocks are yielded once
+        self.assertEqual(keywords.count("e-learning"), 1)
+
+        with io.open(file_out) as f_out, io.open(self.file_in) as expected:
+            self.assertListEqual(list(f_out), list(expected))
+
+    def test_stream_records_in_place(self):
+        records = list(tfg_nlp.stream_records(self.file_in, chunksize=3, f_out=self.file_in))
+
+        self.assertEqual(records[0], {'resource': "https://vivo.invid.udl.cat/individual/UDL-07005349",
+                                      'keyword': "semantic web"})
+        self.assertEqual(pd.read_csv(self.file_in).to_dict('records'), records)
+        self.assertFalse(os.path.exists(self.file_in + '.tmp'))
+
+    def test_stream_records_stopped(self):
+        with open(self.file_in, 'rb') as f_in:
+            original = f_in.read()
+        records = tfg_nlp.stream_records(self.file_in, chunksize=3, f_out=self.file_in)
+        next(records)
+        records.close()
+
+        # The temporary file is removed and the input is left as it was
+        self.assertFalse(os.path.exists(self.file_in + '.tmp'))
+        with open(self.file_in, 'rb') as f_in:
+            self.assertEqual(original, f_in.read())
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,69 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import compact_store
+from compact_store import MappedCompactKeys, read_compacting_keys, read_compacting_keys_csv, write_compacting_keys
+from records import CompactKeys
+from seed_dictionary import SeedDictionary
+
+COMPACTING_FILE = 'files/seed_dictionary/compacting_keys.csv'
+REPLACE_FILE = 'files/seed_dictionary/replace-keywords-uri.csv'
+
+
+class TestCompactStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'compacting_keys.arrow')
+        self.com_keys = read_compacting_keys_csv(COMPACTING_FILE)
+        write_compacting_keys(self.com_keys, self.path)
+
+    def test_read_csv(self):
+        self.assertIsInstance(self.com_keys, CompactKeys)
+        self.assertEqual([{'keyword': 'cloud computing', 'language': 'en'},
+                          {'keyword': 'informàtica en núvol', 'language': 'ca'},
+                          {'keyword': 'computación en la nube', 'language': 'es'}],
+                         self.com_keys['http://www.wikidata.org/entity/Q483639'])
+
+    def test_round_trip(self):
+        loaded = read_compacting_keys(self.path)
+        self.assertIsInstance(loaded, CompactKeys)
+        self.assertEqual(list(self.com_keys), list(loaded))
+        self.assertEqual(dict(self.com_keys), dict(loaded))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_read_by_extension(self):
+        self.assertEqual(dict(self.com_keys), dict(read_compacting_keys(COMPACTING_FILE)))
+
+    def test_memory_mapped(self):
+        with MappedCompactKeys(self.path) as mapped:
+            self.assertEqual(len(self.com_keys), len(mapped))
+            self.assertEqual(list(self.com_keys), list(mapped))
+            for uri, labels in self.com_keys.items():
+                self.assertEqual(labels, mapped[uri])
+            self.assertNotIn('http://www.wikidata.org/entity/Q3', mapped)
+
+    def test_empty(self):
+        write_compacting_keys({}, self.path)
+        self.assertEqual(0, len(read_compacting_keys(self.path)))
+
+    def test_seed_from_arrow(self):
+        from_csv = SeedDictionary.load(COMPACTING_FILE, REPLACE_FILE)
+        from_arrow = SeedDictionary.load(self.path, REPLACE_FILE)
+        self.assertEqual(from_csv.links, from_arrow.links)
+
+    def test_csv_without_pyarrow(self):
+        # The seed dictionary loads compacting_keys.csv without importing pyarrow
+        code = ("import sys; from seed_dictionary import SeedDictionary; "
+                "SeedDictionary.load({!r}, {!r}); print('pyarrow' in sys.modules)".format(COMPACTING_FILE, REPLACE_FILE))
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(compact_store.__file__)))
+        output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, check=True)
+        self.assertEqual('False', output.stdout.strip())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from compaction import CompactingKeys
+
+LABELS = {
+    'http://www.wikidata.org/entity/Q483639': [{'keyword': 'cloud computing', 'language': 'en'},
+                                               {'keyword': 'informàtica en núvol', 'language': 'ca'},
+                                               {'keyword': 'computación en la nube', 'language': 'es'}],
+    'http://dbpedia.org/resource/Epidemiology': [{'keyword': 'epidemiology', 'language': 'en'},
+                                                 {'keyword': 'epidemiology', 'language': 'en'}]
+}
+
+
+def result(lang, wikidata=None, dbpedia=None):
+    return {'lang': lang, 'Wikidata': wikidata, 'DBpedia': dbpedia}
+
+
+class TestCompactingKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.fetched = []
+        self.compaction = CompactingKeys(self.fetch)
+
+    def fetch(self, uri):
+        self.fetched.append(uri)
+        return LABELS.get(uri, [])
+
+    def test_labels(self):
+        self.compaction.add_result('cloud computing', result('en', 'http://www.wikidata.org/entity/Q483639',
+                                                             'http://dbpedia.org/resource/Cloud_computing'))
+
+        # The keyword first, then the labels of its uri without repetitions
+        self.assertEqual(self.compaction.finalize(), {'http://www.wikidata.org/entity/Q483639': LABELS[
+            'http://www.wikidata.org/entity/Q483639']})
+
+    def test_dbpedia(self):
+        self.compaction.add_result('epidemiology plant diseases',
+                                   result('en', dbpedia='http://dbpedia.org/resource/Epidemiology'))
+
+        self.assertEqual(self.compaction.finalize(), {'http://dbpedia.org/resource/Epidemiology': [
+            {'keyword': 'epidemiology plant diseases', 'language': 'en'},
+            {'keyword': 'epidemiology', 'language': 'en'}]})
+
+    def test_same_uri(self):
+        self.compaction.add_result('computación en la nube', result('es', 'http://www.wikidata.org/entity/Q483639'))
+        self.compaction.add_result('computacion en la nube', result('es', 'http://www.wikidata.org/entity/Q483639'))
+        self.compaction.add_result('cloud computing', result('en', 'http://www.wikidata.org/entity/Q483639'))
+
+        # Every keyword of the uri is kept and its labels are fetched once
+        self.assertEqual([label['keyword'] for label in
+                          self.compaction.finalize()['http://www.wikidata.org/entity/Q483639']],
+                         ['computación en la nube', 'cloud computing', 'informàtica en núvol',
+                          'computacion en la nube'])
+        self.assertEqual(self.fetched, ['http://www.wikidata.org/entity/Q483639'])
+
+    def test_single_label(self):
+        self.compaction.add_result('wilkomen', result('en'))
+        self.compaction.add_result('usability', result('en', 'http://www.wikidata.org/entity/Q216378'))
+
+        # Keywords without uri are skipped and uris with a single label pruned
+        self.assertEqual(len(self.compaction), 1)
+        self.assertEqual(self.compaction.finalize(), {})
+
+    def test_without_fetch(self):
+        compaction = CompactingKeys()
+        compaction.add('usability', 'en', 'http://www.wikidata.org/entity/Q216378')
+        compaction.add('usabilidad', 'es', 'http://www.wikidata.org/entity/Q216378')
+
+        self.assertEqual(compaction.finalize(), {'http://www.wikidata.org/entity/Q216378': [
+            {'keyword': 'usability', 'language': 'en'}, {'keyword': 'usabilidad', 'language': 'es'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
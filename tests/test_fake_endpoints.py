@@ -0,0 +1,282 @@
+import os
+import tempfile
+import unittest
+
+import requests
+
+import compacting_keys
+import linking_entity_linking
+from compacting_keys import DBpedia_batch_wrapper, DBpedia_wrapper, Wikidata_batch_wrapper, Wikidata_wrapper
+from fake_endpoints import FakeEndpoints
+from link_cache import LinkCache, LRUCache
+from linking_entity_linking import DBPediaEntityLinker, WikidataEntityLinker
+
+FIXTURES = "files/fake_endpoints/fixtures.json"
+
+
+def set_endpoints(wikidata, spotlight, wikidata_sparql, dbpedia_sparql):
+    previous = (linking_entity_linking.WIKIDATA_BASE, linking_entity_linking.DBPEDIA_SPOTLIGHT_BASE,
+                compacting_keys.WIKIDATA_SPARQL, compacting_keys.DBPEDIA_SPARQL)
+    linking_entity_linking.WIKIDATA_BASE = wikidata
+    linking_entity_linking.DBPEDIA_SPOTLIGHT_BASE = spotlight
+    compacting_keys.WIKIDATA_SPARQL = wikidata_sparql
+    compacting_keys.DBPEDIA_SPARQL = dbpedia_sparql
+    return previous
+
+
+def point_to(url):
+    # Point the linkers and label wrappers to the fake server, returning the previous endpoints
+    return set_endpoints(url + "/w", url + "/en", url + "/sparql", url + "/sparql")
+
+
+class TestFakeEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeEndpoints(FIXTURES).start()
+        cls.previous = point_to(cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        set_endpoints(*cls.previous)
+        cls.server.stop()
+
+    def test_wikidata_linking(self):
+        entity = WikidataEntityLinker().link_entity('e-learning', "en")
+        self.assertEqual(entity, 'http://www.wikidata.org/entity/Q1068473')
+
+    def test_wikidata_linking_preferred(self):
+        entity = WikidataEntityLinker().link_entity('journal', "en")
+        self.assertEqual(entity, 'http://www.wikidata.org/entity/Q41298')
+
+    def test_wikidata_linking_unknown(self):
+        entity = WikidataEntityLinker().link_entity('wilkomen', "en")
+        self.assertIsNone(entity)
+
+    def test_wikidata_linking_memory_cache(self):
+        memory_cache = LRUCache()
+        linker = WikidataEntityLinker(memory_cache=memory_cache)
+        before = self.server.requests['wbsearchentities']
+
+        self.assertEqual(linker.link_entity('e-learning', "en"), 'http://www.wikidata.org/entity/Q1068473')
+        self.assertIsNone(linker.link_entity('wilkomen', "en"))
+        self.assertEqual(linker.link_entity('e-learning', "en"), 'http://www.wikidata.org/entity/Q1068473')
+        self.assertIsNone(linker.link_entity('wilkomen', "en"))
+
+        # Links and labels without link are searched only once
+        self.assertEqual(self.server.requests['wbsearchentities'] - before, 2)
+        self.assertEqual((memory_cache.hits, memory_cache.misses), (2, 2))
+
+    def test_shared_memory_cache(self):
+        memory_cache = LRUCache(max_entries=1)
+        WikidataEntityLinker(memory_cache=memory_cache).link_entity('e-learning', "en")
+        DBPediaEntityLinker(memory_cache=memory_cache).link_entities('e-learning')
+
+        self.assertEqual(len(memory_cache), 1)
+        self.assertEqual(memory_cache.evictions, 1)
+
+    def test_wikidata_transform(self):
+        linker = WikidataEntityLinker(n_jobs=4)
+        before = self.server.requests['wbsearchentities']
+
+        links = linker.transform(['e-learning', 'journal', 'e-learning', 'wilkomen', 'e-learning'])
+
+        self.assertEqual(links, ['http://www.wikidata.org/entity/Q1068473', 'http://www.wikidata.org/entity/Q41298',
+                                 'http://www.wikidata.org/entity/Q1068473', None,
+                                 'http://www.wikidata.org/entity/Q1068473'])
+        self.assertEqual(self.server.requests['wbsearchentities'] - before, 3)
+
+    def test_wikidata_transform_link_cache(self):
+        # The persistent cache is used from the threads of the threading backend
+        with tempfile.TemporaryDirectory() as directory:
+            cache = LinkCache(os.path.join(directory, 'links.sqlite'))
+            cache.set('https://www.wikidata.org/w', 'cached', 'en', 'http://www.wikidata.org/entity/Q1')
+            linker = WikidataEntityLinker(cache=cache, n_jobs=4)
+
+            links = linker.transform(['e-learning', 'journal', 'wilkomen', 'e-learning'])
+
+            self.assertEqual(links, ['http://www.wikidata.org/entity/Q1068473', 'http://www.wikidata.org/entity/Q41298',
+                                     None, 'http://www.wikidata.org/entity/Q1068473'])
+            self.assertEqual(len(cache), 4)
+            cache.close()
+
+    def test_wikidata_transform_languages(self):
+        links = WikidataEntityLinker(n_jobs=2).transform(['e-learning', 'e-learning'], language=['en', 'es'])
+
+        self.assertEqual(links, ['http://www.wikidata.org/entity/Q1068473', 'http://www.wikidata.org/entity/Q1068473'])
+
+    def test_dbpedia_transform(self):
+        linker = DBPediaEntityLinker(n_jobs=4, backend='multiprocessing')
+        texts = ['e-learning', 'artificial intelligence', 'wilkomen', 'e-learning']
+
+        links = linker.transform(texts)
+
+        self.assertEqual(links, ['http://dbpedia.org/resource/Educational_technology',
+                                 'http://dbpedia.org/resource/Artificial_intelligence', None,
+                                 'http://dbpedia.org/resource/Educational_technology'])
+        # Links found in other processes are kept in the cache of the linker
+        self.assertEqual(len(linker.memory_cache), 3)
+        self.assertEqual(linker.transform(texts), links)
+
+    def test_dbpedia_linking(self):
+        entity = DBPediaEntityLinker().link_entities('e-learning')
+        self.assertEqual(entity, 'http://dbpedia.org/resource/Educational_technology')
+
+    def test_dbpedia_linking_longest_form(self):
+        entity = DBPediaEntityLinker().link_entities('artificial intelligence')
+        self.assertEqual(entity, 'http://dbpedia.org/resource/Artificial_intelligence')
+
+    def test_dbpedia_linking_unknown(self):
+        entity = DBPediaEntityLinker().link_entities('wilkomen')
+        self.assertIsNone(entity)
+
+    def test_wikidata_wrapper(self):
+        labels = Wikidata_wrapper('http://www.wikidata.org/entity/Q483639')
+        self.assertEqual(labels, [{'keyword': 'cloud computing', 'language': 'en'},
+                                  {'keyword': 'informàtica en núvol', 'language': 'ca'},
+                                  {'keyword': 'computación en la nube', 'language': 'es'}])
+
+    def test_wikidata_wrapper_publication(self):
+        labels = Wikidata_wrapper('http://www.wikidata.org/entity/Q5633421')
+        self.assertEqual(labels, [])
+
+    def test_dbpedia_wrapper(self):
+        labels = DBpedia_wrapper('http://dbpedia.org/resource/Cloud_computing')
+        self.assertEqual(labels, [{'keyword': 'cloud computing', 'language': 'en'},
+                                  {'keyword': 'computación en la nube', 'language': 'es'}])
+
+    def test_wikidata_batch_wrapper(self):
+        urls = ['http://www.wikidata.org/entity/Q483639', 'http://www.wikidata.org/entity/Q1068473',
+                'http://www.wikidata.org/entity/Q5633421', 'http://www.wikidata.org/entity/Q1']
+        labels = Wikidata_batch_wrapper(urls, chunk_size=3)
+
+        self.assertEqual(labels, {url: Wikidata_wrapper(url) for url in urls})
+
+    def test_dbpedia_batch_wrapper(self):
+        urls = ['http://dbpedia.org/resource/Cloud_computing', 'http://dbpedia.org/resource/Trout']
+        labels = DBpedia_batch_wrapper(urls)
+
+        self.assertEqual(labels, {url: DBpedia_wrapper(url) for url in urls})
+
+    def test_batch_wrapper_chunks(self):
+        urls = ['http://www.wikidata.org/entity/Q{}'.format(i) for i in range(10)]
+        before = self.server.requests['sparql']
+        Wikidata_batch_wrapper(urls + urls, chunk_size=4)
+
+        self.assertEqual(self.server.requests['sparql'] - before, 3)
+
+    def test_batch_wrapper_malformed_uri(self):
+        # Only the malformed URI is lost, the labels of the rest of its chunk are kept
+        urls = ['http://www.wikidata.org/entity/Q483639', 'http://www.wikidata.org/entity/"Q1"']
+        labels = Wikidata_batch_wrapper(urls)
+
+        self.assertEqual(labels, {'http://www.wikidata.org/entity/Q483639': Wikidata_wrapper(urls[0]),
+                                  'http://www.wikidata.org/entity/"Q1"': []})
+        self.assertNotEqual(labels[urls[0]], [])
+
+    def test_sparql_values(self):
+        query = "SELECT * WHERE { VALUES ?uri { <http://www.wikidata.org/entity/Q483639> " \
+                "<http://dbpedia.org/resource/Cloud_computing> } }"
+        response = requests.post(self.server.url + "/sparql", data={'query': query})
+        uris = {binding['uri']['value'] for binding in response.json()['results']['bindings']}
+        self.assertEqual(uris, {'http://www.wikidata.org/entity/Q483639',
+                                'http://dbpedia.org/resource/Cloud_computing'})
+
+    def test_annotate_offsets(self):
+        text = "cloud computing\n.\ne-learning"
+        response = requests.post(self.server.url + "/en/annotate", data={'text': text},
+                                 headers={"accept": "application/json"})
+        offsets = [(r['@offset'], r['@URI']) for r in response.json()['Resources']]
+        self.assertEqual(offsets, [('0', 'http://dbpedia.org/resource/Cloud_computing'),
+                                   ('18', 'http://dbpedia.org/resource/Educational_technology')])
+
+
+class TestDBpediaBatchLinking(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeEndpoints(FIXTURES).start()
+        cls.previous = point_to(cls.server.url)
+
+    @classmethod
+    def tearDownClass(cls):
+        set_endpoints(*cls.previous)
+        cls.server.stop()
+
+    def test_link_entities_batch(self):
+        keywords = ['e-learning', 'wilkomen', 'artificial intelligence', 'cloud computing', 'e-learning']
+        links = DBPediaEntityLinker().link_entities_batch(keywords)
+
+        self.assertEqual(links, {'e-learning': 'http://dbpedia.org/resource/Educational_technology',
+                                 'wilkomen': None,
+                                 'artificial intelligence': 'http://dbpedia.org/resource/Artificial_intelligence',
+                                 'cloud computing': 'http://dbpedia.org/resource/Cloud_computing'})
+
+    def test_same_as_single(self):
+        keywords = ['e-learning', 'intelligence', 'cost-utility analysis']
+        linker = DBPediaEntityLinker()
+        links = linker.link_entities_batch(keywords)
+
+        for keyword in keywords:
+            self.assertEqual(links[keyword], linker.link_entities(keyword))
+
+    def test_pack(self):
+        previous = linking_entity_linking.DBPEDIA_SPOTLIGHT_MAX_CHARS
+        linking_entity_linking.DBPEDIA_SPOTLIGHT_MAX_CHARS = 25
+        try:
+            batches = list(DBPediaEntityLinker().pack(['e-learning', 'cloud computing', 'intelligence', 'x' * 30]))
+        finally:
+            linking_entity_linking.DBPEDIA_SPOTLIGHT_MAX_CHARS = previous
+
+        self.assertEqual(batches, [['e-learning'], ['cloud computing'], ['intelligence'], ['x' * 30]])
+
+    def test_one_request_per_batch(self):
+        keywords = ['keyword {}'.format(i) for i in range(500)] + ['cloud computing']
+        before = self.server.requests['annotate']
+        links = DBPediaEntityLinker().link_entities_batch(keywords)
+
+        self.assertEqual(self.server.requests['annotate'] - before, 1)
+        self.assertEqual(links['cloud computing'], 'http://dbpedia.org/resource/Cloud_computing')
+        self.assertIsNone(links['keyword 1'])
+
+
+class TestFakeEndpointsThrottling(unittest.TestCase):
+
+    def test_throttle_first(self):
+        with FakeEndpoints(FIXTURES, throttle_first=1, throttle_status=403, retry_after=2) as server:
+            url = server.url + "/w/api.php"
+            params = {'action': 'wbsearchentities', 'search': 'e-learning'}
+            first = requests.get(url, params=params)
+            second = requests.get(url, params=params)
+
+        self.assertEqual(first.status_code, 403)
+        self.assertEqual(first.headers['Retry-After'], '2')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(server.throttled_requests['wbsearchentities'], 1)
+
+    def test_dbpedia_linking_throttled(self):
+        with FakeEndpoints(FIXTURES, throttle_first=1, throttle_status=403) as server:
+            previous = point_to(server.url)
+            try:
+                entity = DBPediaEntityLinker(throttling_time=0).link_entities('cloud computing')
+            finally:
+                set_endpoints(*previous)
+
+        self.assertEqual(entity, 'http://dbpedia.org/resource/Cloud_computing')
+        self.assertEqual(server.requests['annotate'], 2)
+
+    def test_batch_wrapper_throttled(self):
+        # Errors that aren't caused by the URIs are raised without splitting the chunk
+        urls = ['http://www.wikidata.org/entity/Q483639', 'http://www.wikidata.org/entity/Q1068473']
+        with FakeEndpoints(FIXTURES, throttle_rate=1.0, throttle_status=429, retry_after=0) as server:
+            previous = point_to(server.url)
+            try:
+                with self.assertRaises(requests.HTTPError):
+                    Wikidata_batch_wrapper(urls)
+            finally:
+                set_endpoints(*previous)
+
+        # The first request and its retries, for a single chunk
+        self.assertEqual(server.requests['sparql'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import unittest
+
+from grouping import GroupIndex, get_stemmer, keyword_root
+
+
+class TestGroupIndex(unittest.TestCase):
+
+    def test_stemmer_cached(self):
+        self.assertIs(get_stemmer('es'), get_stemmer('es'))
+
+    def test_keyword_root_every_word(self):
+        self.assertEqual(keyword_root("stem cells", 'en'), keyword_root("stem cell", 'en'))
+
+    def test_keyword_root_spanish(self):
+        self.assertEqual(keyword_root("tecnologías", 'es'), keyword_root("tecnología", 'es'))
+
+    def test_keyword_root_lemma(self):
+        self.assertEqual(keyword_root("investigacions", 'ca', "investigació"), "investigació")
+
+    def test_group_variants(self):
+        index = GroupIndex().add(["stem cells", "stem cell", "tecnologías", "tecnología"], ['en', 'en', 'es', 'es'])
+
+        self.assertEqual(index.group("stem cell"), ["stem cells", "stem cell"])
+        self.assertEqual(index.group("tecnología"), ["tecnologías", "tecnología"])
+
+    def test_representatives(self):
+        index = GroupIndex().add(["stem cells", "stem cell", "cloud computing"], ['en', 'en', 'en'])
+        representative = index.representatives(["stem cell", "cloud computing", "e-learning"])
+
+        self.assertEqual(representative, {"stem cell": "stem cell",
+                                          "cloud computing": "cloud computing",
+                                          "e-learning": "e-learning"})
+
+    def test_save_load(self):
+        file = "files/group_index.json"
+        GroupIndex().add(["stem cells", "stem cell"], ['en', 'en']).save(file)
+
+        index = GroupIndex.load(file)
+        os.remove(file)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.group("stem cells"), ["stem cells", "stem cell"])
+
+    def test_load_missing(self):
+        self.assertEqual(len(GroupIndex.load("files/missing.json")), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
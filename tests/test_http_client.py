@@ -0,0 +1,77 @@
+import time
+import unittest
+
+import requests
+
+import http_client
+from fake_endpoints import FakeEndpoints
+from http_client import RetryPolicy, get_session
+from test_fake_endpoints import FIXTURES
+
+SEARCH = {'action': 'wbsearchentities', 'search': 'e-learning', 'format': 'json'}
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_exponential_delay(self):
+        policy = RetryPolicy(backoff_factor=1, jitter=0)
+
+        self.assertEqual([policy.delay(attempt) for attempt in range(4)], [1, 2, 4, 8])
+
+    def test_max_backoff(self):
+        policy = RetryPolicy(backoff_factor=1, max_backoff=5, jitter=0)
+
+        self.assertEqual(policy.delay(10), 5)
+
+    def test_jitter(self):
+        policy = RetryPolicy(backoff_factor=2, jitter=0.5)
+
+        for _ in range(20):
+            self.assertTrue(2 <= policy.delay(0) <= 3)
+
+    def test_retry_after(self):
+        policy = RetryPolicy(backoff_factor=1)
+
+        self.assertEqual(policy.delay(3, "2"), 2)
+
+
+class TestHttpClient(unittest.TestCase):
+
+    def test_session_per_endpoint(self):
+        session = get_session("http://localhost:1")
+
+        self.assertIs(get_session("http://localhost:1"), session)
+        self.assertIsNot(get_session("http://localhost:2"), session)
+
+    def test_retry_throttled(self):
+        with FakeEndpoints(FIXTURES, throttle_first=2, throttle_status=429) as server:
+            res = http_client.get(server.url + "/w/api.php", params=SEARCH,
+                                  policy=RetryPolicy(backoff_factor=0))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(server.requests['wbsearchentities'], 3)
+
+    def test_retry_budget(self):
+        with FakeEndpoints(FIXTURES, throttle_rate=1.0, throttle_status=403) as server:
+            with self.assertRaises(requests.HTTPError):
+                http_client.get(server.url + "/w/api.php", params=SEARCH,
+                                policy=RetryPolicy(max_retries=2, backoff_factor=0))
+
+        self.assertEqual(server.requests['wbsearchentities'], 3)
+
+    def test_honor_retry_after(self):
+        with FakeEndpoints(FIXTURES, throttle_first=1, retry_after=1) as server:
+            start = time.monotonic()
+            http_client.get(server.url + "/w/api.php", params=SEARCH, policy=RetryPolicy(backoff_factor=0))
+            elapsed = time.monotonic() - start
+
+        self.assertGreaterEqual(elapsed, 1)
+
+    def test_unreachable(self):
+        with self.assertRaises(requests.ConnectionError):
+            http_client.get("http://127.0.0.1:9/w/api.php", policy=RetryPolicy(max_retries=1, backoff_factor=0),
+                            timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from link_cache import LinkCache, LRUCache, MISSING
+
+
+def store_link(cache, label):
+    cache.set('http://example.org', label, 'en', 'http://example.org/' + label)
+
+
+class TestLinkCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = LinkCache(os.path.join(self.directory.name, 'links.sqlite'))
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_missing(self):
+        self.assertIs(self.cache.get('http://example.org', 'e-learning', 'en'), MISSING)
+
+    def test_set_get(self):
+        self.cache.set('http://example.org', 'e-learning', 'en', 'http://www.wikidata.org/entity/Q1068473')
+
+        self.assertEqual(self.cache.get('http://example.org', 'e-learning', 'en'),
+                         'http://www.wikidata.org/entity/Q1068473')
+        self.assertIs(self.cache.get('http://example.org', 'e-learning', 'es'), MISSING)
+
+    def test_negative_result(self):
+        self.cache.set('http://example.org', 'wilkomen', 'en', None)
+
+        self.assertIsNone(self.cache.get('http://example.org', 'wilkomen', 'en'))
+
+    def test_expired(self):
+        self.cache.ttl = 0
+        self.cache.set('http://example.org', 'e-learning', 'en', 'http://www.wikidata.org/entity/Q1068473')
+        time.sleep(0.01)
+
+        self.assertIs(self.cache.get('http://example.org', 'e-learning', 'en'), MISSING)
+        self.cache.purge()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_persistent(self):
+        self.cache.set('http://example.org', 'e-learning', 'en', 'http://www.wikidata.org/entity/Q1068473')
+        self.cache.close()
+
+        cache = LinkCache(self.cache.path)
+        self.assertEqual(cache.get('http://example.org', 'e-learning', 'en'),
+                         'http://www.wikidata.org/entity/Q1068473')
+        cache.close()
+
+    def test_shared_between_processes(self):
+        labels = ['label{}'.format(i) for i in range(20)]
+        with multiprocessing.Pool(4) as pool:
+            pool.starmap(store_link, [(self.cache, label) for label in labels])
+
+        for label in labels:
+            self.assertEqual(self.cache.get('http://example.org', label, 'en'), 'http://example.org/' + label)
+
+    def test_shared_between_threads(self):
+        # Opened in the main thread, then used by every thread with its own connection
+        self.cache.set('http://example.org', 'main', 'en', 'http://example.org/main')
+        labels = ['label{}'.format(i) for i in range(20)]
+        threads = [threading.Thread(target=store_link, args=(self.cache, label)) for label in labels]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.cache), 21)
+        for label in labels:
+            self.assertEqual(self.cache.get('http://example.org', label, 'en'), 'http://example.org/' + label)
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_negative_result(self):
+        cache = LRUCache()
+        cache.set(('http://example.org', 'wilkomen', 'en'), None)
+
+        self.assertIsNone(cache.get(('http://example.org', 'wilkomen', 'en')))
+        self.assertIs(cache.get(('http://example.org', 'wilkomen', 'es')), MISSING)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_max_entries(self):
+        cache = LRUCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        # The least recently used entry is evicted
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_max_bytes(self):
+        cache = LRUCache(max_entries=None, max_bytes=20000)
+        for i in range(1000):
+            cache.set(('http://example.org', 'label{}'.format(i), 'en'), 'http://example.org/{}'.format(i))
+
+        self.assertLessEqual(cache.size, 20000)
+        self.assertEqual(len(cache) + cache.evictions, 1000)
+        self.assertIn(('http://example.org', 'label999', 'en'), cache)
+
+    def test_replace(self):
+        cache = LRUCache()
+        cache.set('a', 'http://example.org/a')
+        size = cache.size
+        cache.set('a', 'http://example.org/b')
+
+        self.assertEqual(cache.size, size)
+        self.assertEqual(cache.stats(), {'entries': 1, 'bytes': size, 'hits': 0, 'misses': 0, 'evictions': 0})
+
+
+if __name__ == '__main__':
+    unittest.main()
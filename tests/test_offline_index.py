@@ -0,0 +1,100 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import compacting_keys
+from compacting_keys import Wikidata_wrapper
+from fake_endpoints import FakeEndpoints
+from offline_index import DBpedia_offline_wrapper, LabelIndex, OfflineDBPediaEntityLinker, \
+    OfflineWikidataEntityLinker, Wikidata_offline_wrapper, build_index, unescape
+
+DUMPS = ["files/offline_index/wikidata_labels.nt", "files/offline_index/dbpedia_labels.tsv"]
+ARTICLES = ["files/offline_index/articles.txt"]
+
+
+class TestOfflineIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, 'labels.idx')
+        cls.total = build_index(DUMPS, cls.path, articles=ARTICLES)
+        cls.index = LabelIndex(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.index.close()
+        cls.directory.cleanup()
+
+    def test_build(self):
+        # Labels in other languages and other predicates are skipped
+        self.assertEqual(self.total, 13)
+        self.assertEqual(len(self.index), 13)
+
+    def test_unescape(self):
+        self.assertEqual(unescape(r'\"usabilitat\" à'), '"usabilitat" à')
+
+    def test_lookup(self):
+        self.assertEqual(sorted(self.index.lookup("Cloud  Computing")),
+                         [('http://dbpedia.org/resource/Cloud_computing', 'en'),
+                          ('http://www.wikidata.org/entity/Q483639', 'en')])
+        self.assertEqual(self.index.lookup("wilkomen"), [])
+
+    def test_labels(self):
+        self.assertEqual(self.index.labels('http://www.wikidata.org/entity/Q483639'),
+                         [{'keyword': 'cloud computing', 'language': 'en'},
+                          {'keyword': 'computación en la nube', 'language': 'es'},
+                          {'keyword': 'informàtica en núvol', 'language': 'ca'}])
+        self.assertEqual(self.index.labels('http://www.wikidata.org/entity/Q1'), [])
+
+    def test_wikidata_linking(self):
+        linker = OfflineWikidataEntityLinker(self.index)
+
+        self.assertEqual(linker.link_entity('e-learning', 'en'), 'http://www.wikidata.org/entity/Q1068473')
+        self.assertEqual(linker.link_entity('aprendizaje electrónico', 'es'),
+                         'http://www.wikidata.org/entity/Q1068473')
+        self.assertEqual(linker.link_entity('"usabilitat"', 'ca'), 'http://www.wikidata.org/entity/Q216378')
+        self.assertIsNone(linker.link_entity('wilkomen', 'en'))
+
+    def test_dbpedia_linking(self):
+        linker = OfflineDBPediaEntityLinker(self.index)
+
+        self.assertEqual(linker.link_entities('e-learning'), 'http://dbpedia.org/resource/Educational_technology')
+        self.assertIsNone(linker.link_entities('tecnologia educativa'))
+
+    def test_wrappers(self):
+        self.assertEqual(Wikidata_offline_wrapper('http://www.wikidata.org/entity/Q216378', self.index),
+                         [{'keyword': 'usability', 'language': 'en'},
+                          {'keyword': 'usabilidad', 'language': 'es'},
+                          {'keyword': '"usabilitat"', 'language': 'ca'}])
+        self.assertEqual(DBpedia_offline_wrapper('http://dbpedia.org/resource/Cloud_computing', self.index),
+                         [{'keyword': 'cloud computing', 'language': 'en'},
+                          {'keyword': 'computación en la nube', 'language': 'es'}])
+
+    def test_wrapper_publication(self):
+        # Labels of publications are kept in the index but not returned, as the online wrapper does
+        url = 'http://www.wikidata.org/entity/Q5633421'
+        self.assertTrue(self.index.is_article(url))
+        self.assertFalse(self.index.is_article('http://www.wikidata.org/entity/Q483639'))
+        self.assertEqual(self.index.labels(url), [{'keyword': 'journal', 'language': 'en'}])
+
+        with FakeEndpoints("files/fake_endpoints/fixtures.json") as server:
+            previous = compacting_keys.WIKIDATA_SPARQL
+            compacting_keys.WIKIDATA_SPARQL = server.url + "/sparql"
+            try:
+                online = Wikidata_wrapper(url)
+            finally:
+                compacting_keys.WIKIDATA_SPARQL = previous
+
+        self.assertEqual(online, [])
+        self.assertEqual(Wikidata_offline_wrapper(url, self.index), online)
+
+    def test_pickle(self):
+        index = pickle.loads(pickle.dumps(self.index))
+
+        self.assertEqual(index.lookup('usability'), [('http://www.wikidata.org/entity/Q216378', 'en')])
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,14 @@
+import io
 import json
+import os
+import shutil
+import tempfile
 import unittest
 
+from checkpoint import CheckpointStore
 from compacting_keys import DBpedia_wrapper
+from compaction import CompactingKeys
+from rdflib import Graph
 from src import tfg_nlp
 
 
@@ -105,6 +112,43 @@ class TestProcessKeyword(unittest.TestCase):
         for result in results:
             self.assertEqual("http://www.wikidata.org/entity/Q41298", result["result"]["Wikidata"])
 
+    def test_process_task_error(self):
+        # The error of a keyword is returned with it instead of stopping the pool
+        output = tfg_nlp.process_task(('cloud computing', 'cloud computing', 'not a dict of links'))
+        self.assertEqual('cloud computing', output['keyword'])
+        self.assertIn('error', output)
+        self.assertNotIn('result', output)
+
+    def test_collect_results_failed(self):
+        d_key = {'e-learning': {}, 'e learning': {}, 'elearning': {}, 'cloud computing': {}}
+        # elearning is collapsed into e-learning, e learning is linked on its own
+        representative = {'e-learning': 'e-learning', 'e learning': 'e learning', 'elearning': 'e-learning',
+                          'cloud computing': 'cloud computing'}
+        result = {'lang': 'en', 'stop-word': 'e learning', 'lemmatizer': 'e learning',
+                  'Wikidata': 'http://www.wikidata.org/entity/Q1068473', 'DBpedia': None}
+        outputs = [{'keyword': 'e learning', 'result': result},
+                   {'keyword': 'e-learning', 'error': 'HTTPError: 503 Server Error'},
+                   {'keyword': 'cloud computing', 'result': dict(result, **{'stop-word': 'cloud computing'})}]
+
+        with tempfile.TemporaryDirectory() as directory:
+            store = CheckpointStore(os.path.join(directory, 'checkpoint.jsonl'))
+            failed = tfg_nlp.collect_results(d_key, iter(outputs), store, (), representative)
+            store.close()
+
+            self.assertEqual(failed, {'e-learning': 'HTTPError: 503 Server Error'})
+            self.assertEqual(CheckpointStore(store.path).failures(), failed)
+
+        # The failed keyword and its collapsed variant have no result, the variant linked on its own has it
+        self.assertEqual(list(d_key), ['e learning', 'cloud computing'])
+        self.assertEqual(d_key['e learning']['Wikidata'], 'http://www.wikidata.org/entity/Q1068473')
+
+        # The next stages don't find keywords without result
+        tfg_nlp.statistics_d_keys(d_key)
+        compaction = CompactingKeys()
+        for keyword, keyword_result in d_key.items():
+            compaction.add_result(keyword, keyword_result)
+        self.assertEqual(len(compaction), 1)
+
     def test_compare_uri(self):
         dict_test = {
             'http://dbpedia.org/resource/Anglès,_Girona': [{'keyword': "didàctica de l'anglès", 'language': 'ca'},
@@ -115,6 +159,68 @@ class TestProcessKeyword(unittest.TestCase):
 
         tfg_nlp.compare_resource_keywords_uri(file, dict_test)
 
+    def test_modify_file_keywords_to_uri(self):
+        dict_test = {
+            'cloud computing': {'Wikidata': 'http://www.wikidata.org/entity/Q483639',
+                                'DBpedia': 'http://dbpedia.org/resource/Cloud_computing'},
+            'anglès, girona': {'Wikidata': None, 'DBpedia': 'http://dbpedia.org/resource/Anglès,_Girona'},
+            'wilkomen': {'Wikidata': None, 'DBpedia': None},
+            'e-learning': {'Wikidata': 'http://www.wikidata.org/entity/Q1068473', 'DBpedia': None},
+            'qrt-pcr': {'Wikidata': None, 'DBpedia': 'http://dbpedia.org/resource/Polymerase_chain_reaction'}}
+        file_in = 'files/replace/replace_example.csv'
+        file_out = 'files/replace/replace_result.csv'
+        expected_file = 'files/replace/expected_replace.csv'
+
+        tfg_nlp.modify_file_keywords_to_uri(dict_test, file_in, file_out)
+
+        with io.open(file_out, encoding='utf-8') as f_out, io.open(expected_file, encoding='utf-8') as expected:
+            self.assertListEqual(list(f_out), list(expected))
+
+    def test_compare_uri_stream(self):
+        dict_test = {'http://www.wikidata.org/entity/Q483639': [],
+                     'http://dbpedia.org/resource/Anglès,_Girona': []}
+        file_in = 'files/replace/expected_replace.csv'
+        expected = ['resource,keyword\n',
+                    'https://vivo.invid.udl.cat/individual/UDL-07005349,http://www.wikidata.org/entity/Q483639\n',
+                    'https://vivo.invid.udl.cat/individual/UDL-07005349,'
+                    '"http://dbpedia.org/resource/Anglès,_Girona"\n',
+                    'https://vivo.invid.udl.cat/individual/UDL-07005352,http://www.wikidata.org/entity/Q483639\n']
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_memory = os.path.join(directory, 'memory.csv')
+            file_stream = os.path.join(directory, 'stream.csv')
+            shutil.copy(file_in, file_memory)
+            shutil.copy(file_in, file_stream)
+
+            tfg_nlp.compare_resource_keywords_uri(file_memory, dict_test)
+            tfg_nlp.compare_resource_keywords_uri_stream(file_stream, dict_test, chunksize=2)
+
+            with io.open(file_memory, encoding='utf-8') as f_memory, \
+                    io.open(file_stream, encoding='utf-8') as f_stream:
+                self.assertListEqual(list(f_memory), expected)
+                self.assertListEqual(list(f_stream), expected)
+
+    def test_stream_serialization(self):
+        com_keys = {'http://www.wikidata.org/entity/Q483639': [{'keyword': 'cloud computing', 'language': 'en'},
+                                                               {'keyword': 'núvol', 'language': 'ca'}],
+                    'http://dbpedia.org/resource/Anglès,_Girona': [{'keyword': 'anglès', 'language': 'ca'},
+                                                                   {'keyword': 'anglés', 'language': 'es'}]}
+        with tempfile.TemporaryDirectory() as directory:
+            # Only linked terms are serialized, as in the main program
+            file_in = os.path.join(directory, 'replace.csv')
+            tfg_nlp.compare_resource_keywords_uri_stream('files/replace/expected_replace.csv', com_keys, file_in)
+            file_rdflib = os.path.join(directory, 'rdflib.ttl')
+            file_turtle = os.path.join(directory, 'stream.ttl')
+            file_nt = os.path.join(directory, 'stream.nt')
+
+            tfg_nlp.serialization(list(tfg_nlp.read_researcher_terms(file_in)), dict(com_keys), file_rdflib)
+            tfg_nlp.stream_serialization(tfg_nlp.read_researcher_terms(file_in), com_keys, file_turtle)
+            tfg_nlp.stream_serialization(tfg_nlp.read_researcher_terms(file_in), com_keys, file_nt, 'nt')
+
+            expected = set(Graph().parse(file_rdflib, format='turtle'))
+            self.assertEqual(expected, set(Graph().parse(file_turtle, format='turtle')))
+            self.assertEqual(expected, set(Graph().parse(file_nt, format='nt')))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,141 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from rdflib import Graph, RDF, RDFS, SKOS, URIRef, Literal
+from rdflib.namespace import Namespace
+
+from rdf_writer import MANIFEST, iri, literal, merge_shards, shard_of, write_rdf, write_shards
+
+VIVO = Namespace("http://vivoweb.org/ontology/core#")
+
+COM_KEYS = {
+    'http://www.wikidata.org/entity/Q483639': [{'keyword': 'cloud computing', 'language': 'en'},
+                                               {'keyword': 'informàtica en núvol', 'language': 'ca'},
+                                               {'keyword': 'computación en la nube', 'language': 'es'}],
+    'http://dbpedia.org/resource/"Anglès",_Girona': [{'keyword': 'anglès, girona', 'language': 'en'},
+                                                     {'keyword': 'say "hi"\\ \n\tnow', 'language': 'en'}],
+    # Same uri once the quotes are deleted
+    'http://dbpedia.org/resource/Anglès,_Girona': [{'keyword': 'anglès, girona', 'language': 'en'},
+                                                   {'keyword': 'anglès (la selva)', 'language': 'ca'}],
+}
+RESEARCHER_TERMS = [
+    {'researcher': 'https://experts.udl.cat/individual/UDL-07005349',
+     'term': 'http://www.wikidata.org/entity/Q483639'},
+    {'researcher': 'https://experts.udl.cat/individual/UDL-07005349',
+     'term': 'http://dbpedia.org/resource/Anglès,_Girona'},
+    {'researcher': 'https://experts.udl.cat/individual/UDL-07005352',
+     'term': 'http://www.wikidata.org/entity/Q483639'},
+    {'researcher': 'https://experts.udl.cat/individual/UDL-07005349',
+     'term': 'http://www.wikidata.org/entity/Q483639'},
+]
+
+
+def expected_graph():
+    # Same triples as tfg_nlp.serialization
+    rdf = Graph()
+    for uri, labels in COM_KEYS.items():
+        concept = URIRef(uri.replace('"', ''))
+        rdf.add((concept, RDF.type, SKOS.Concept))
+        for label in labels:
+            rdf.add((concept, RDFS.label, Literal(label['keyword'], lang=label['language'])))
+    for pair in RESEARCHER_TERMS:
+        rdf.add((URIRef(pair['researcher']), VIVO.hasResearchArea, URIRef(pair['term'])))
+    return rdf
+
+
+class TestRDFWriter(unittest.TestCase):
+
+    def write(self, format):
+        # Pairs once, as left by compare_resource_keywords_uri, except for a consecutive repeated term
+        f_out = io.StringIO()
+        triples = write_rdf(iter(RESEARCHER_TERMS[:3] + RESEARCHER_TERMS[2:3]), COM_KEYS, f_out, format=format)
+        return triples, f_out.getvalue()
+
+    def test_turtle(self):
+        triples, text = self.write('turtle')
+        self.assertEqual(len(expected_graph()), triples)
+        self.assertTrue(text.startswith('@prefix core: <http://vivoweb.org/ontology/core#> .\n'))
+        parsed = Graph().parse(data=text, format='turtle')
+        self.assertEqual(set(expected_graph()), set(parsed))
+
+    def test_ntriples(self):
+        triples, text = self.write('nt')
+        self.assertEqual(len(expected_graph()), triples)
+        self.assertEqual(triples, len(text.splitlines()))
+        parsed = Graph().parse(data=text, format='nt')
+        self.assertEqual(set(expected_graph()), set(parsed))
+
+    def test_researcher_blocks(self):
+        # Consecutive terms of a researcher are written in the same block
+        _, text = self.write('turtle')
+        self.assertIn('<https://experts.udl.cat/individual/UDL-07005349> core:hasResearchArea '
+                      '<http://www.wikidata.org/entity/Q483639>,\n'
+                      '        <http://dbpedia.org/resource/Anglès,_Girona> .\n', text)
+
+    def test_quoted_uris(self):
+        # Uris equal without their quotes are one concept with the labels of both
+        _, text = self.write('turtle')
+        self.assertEqual(1, text.count('<http://dbpedia.org/resource/Anglès,_Girona> a skos:Concept'))
+        self.assertEqual(1, text.count('"anglès, girona"@en'))
+        self.assertIn('"anglès (la selva)"@ca', text)
+
+    def test_escaping(self):
+        self.assertEqual('<http://example.org/a\\u0020b\\u003Ec>', iri('http://example.org/a b>c'))
+        self.assertEqual('"say \\"hi\\"\\\\ \\n\\tnow"@en', literal('say "hi"\\ \n\tnow', 'en'))
+        self.assertEqual('"bell\\u0007"', literal('bell\x07'))
+
+
+class TestShardedRDF(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, *names):
+        return os.path.join(self.directory.name, *names)
+
+    def read(self, path):
+        with open(path, 'rb') as f_in:
+            return f_in.read()
+
+    def test_shard_of(self):
+        # Stable between runs, unlike hash() of a str
+        self.assertEqual(0, shard_of('http://www.wikidata.org/entity/Q483639', 4))
+
+    def test_manifest(self):
+        manifest = write_shards(RESEARCHER_TERMS, COM_KEYS, self.path('shards'), 'nt', shards=3, processes=2)
+        # The repeated researcher term is written once, as in a graph
+        self.assertEqual(len(expected_graph()), manifest['triples'])
+        self.assertEqual(['part-00000.nt', 'part-00001.nt', 'part-00002.nt'],
+                         [entry['file'] for entry in manifest['shards']])
+        with open(self.path('shards', MANIFEST), encoding='utf-8') as f_in:
+            self.assertEqual(manifest, json.load(f_in))
+        parsed = Graph()
+        for entry in manifest['shards']:
+            parsed.parse(self.path('shards', entry['file']), format='nt')
+        self.assertEqual(set(expected_graph()), set(parsed))
+
+    def test_merge(self):
+        for format in ('turtle', 'nt'):
+            write_shards(RESEARCHER_TERMS, COM_KEYS, self.path(format), format, shards=3, processes=2)
+            self.assertEqual(len(expected_graph()), merge_shards(self.path(format), self.path('merged.' + format)))
+            parsed = Graph().parse(self.path('merged.' + format), format=format)
+            self.assertEqual(set(expected_graph()), set(parsed))
+
+    def test_deterministic(self):
+        # Same bytes whatever the order of the input and the number of shards
+        reordered = dict(reversed(list(COM_KEYS.items())))
+        write_shards(RESEARCHER_TERMS, COM_KEYS, self.path('a'), 'turtle', shards=3, processes=2)
+        write_shards(RESEARCHER_TERMS[::-1], reordered, self.path('b'), 'turtle', shards=2, processes=2)
+        merge_shards(self.path('a'), self.path('a.ttl'))
+        merge_shards(self.path('b'), self.path('b.ttl'))
+        self.assertEqual(self.read(self.path('a.ttl')), self.read(self.path('b.ttl')))
+        lines = self.read(self.path('a.ttl')).decode('utf-8').split('\n\n')
+        self.assertEqual(sorted(lines[1:-1]), lines[1:-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
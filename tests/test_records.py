@@ -0,0 +1,69 @@
+import json
+import pickle
+import unittest
+
+from records import CompactKeys, KeywordResult, LabelList, compress_uri, expand_uri, to_builtin
+
+RESULT = {'lang': 'en', 'stop-word': 'cloud computing', 'lemmatizer': 'cloud computing',
+          'Wikidata': 'http://www.wikidata.org/entity/Q483639',
+          'DBpedia': 'http://dbpedia.org/resource/Cloud_computing'}
+LABELS = [{'keyword': 'cloud computing', 'language': 'en'},
+          {'keyword': 'informàtica en núvol', 'language': 'ca'},
+          {'keyword': 'computación en la nube', 'language': 'es'}]
+
+
+class TestRecords(unittest.TestCase):
+
+    def test_compress_uri(self):
+        self.assertEqual(compress_uri('http://www.wikidata.org/entity/Q483639'), '\x01Q483639')
+        for uri in ['http://www.wikidata.org/entity/Q483639', 'http://dbpedia.org/resource/Anglès,_Girona',
+                    'http://example.org/resource', None]:
+            self.assertEqual(expand_uri(compress_uri(uri)), uri)
+
+    def test_keyword_result(self):
+        result = KeywordResult.from_dict(RESULT)
+
+        self.assertEqual(result, RESULT)
+        self.assertEqual(dict(result), RESULT)
+        self.assertEqual(result['Wikidata'], 'http://www.wikidata.org/entity/Q483639')
+        self.assertIsNone(KeywordResult.from_dict(dict(RESULT, DBpedia=None))['DBpedia'])
+        self.assertRaises(KeyError, lambda: result['Group'])
+
+    def test_label_list(self):
+        labels = LabelList(LABELS)
+
+        self.assertEqual(labels, LABELS)
+        self.assertEqual(len(labels), 3)
+        self.assertEqual(labels[1], {'keyword': 'informàtica en núvol', 'language': 'ca'})
+        # Written to compacting_keys.csv as the list it replaces
+        self.assertEqual(str(labels), str(LABELS))
+        self.assertEqual(LabelList([{'keyword': 'cloud-computing', 'language': 'de'}])[0]['language'], 'de')
+
+    def test_compact_keys(self):
+        com_keys = CompactKeys({'http://www.wikidata.org/entity/Q483639': LABELS})
+        com_keys['http://dbpedia.org/resource/"Quoted"'] = LABELS[:2]
+
+        self.assertEqual(list(com_keys), ['http://www.wikidata.org/entity/Q483639',
+                                          'http://dbpedia.org/resource/"Quoted"'])
+        self.assertEqual(com_keys['http://www.wikidata.org/entity/Q483639'], LABELS)
+        self.assertIn('http://dbpedia.org/resource/"Quoted"', com_keys)
+        del com_keys['http://dbpedia.org/resource/"Quoted"']
+        self.assertEqual(com_keys, {'http://www.wikidata.org/entity/Q483639': LABELS})
+
+    def test_json(self):
+        d_key = {'cloud computing': KeywordResult.from_dict(RESULT)}
+        com_keys = CompactKeys({'http://www.wikidata.org/entity/Q483639': LABELS})
+
+        self.assertEqual(json.loads(json.dumps(d_key, default=to_builtin)), {'cloud computing': RESULT})
+        self.assertEqual(json.loads(json.dumps(com_keys, default=to_builtin)),
+                         {'http://www.wikidata.org/entity/Q483639': LABELS})
+
+    def test_pickle(self):
+        com_keys = CompactKeys({'http://www.wikidata.org/entity/Q483639': LABELS})
+
+        self.assertEqual(pickle.loads(pickle.dumps(com_keys)), com_keys)
+        self.assertEqual(pickle.loads(pickle.dumps(KeywordResult.from_dict(RESULT))), RESULT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from seed_dictionary import AhoCorasick, SeedDictionary
+
+COMPACTING_FILE = "files/seed_dictionary/compacting_keys.csv"
+REPLACE_FILE = "files/seed_dictionary/replace-keywords-uri.csv"
+
+
+class TestSeedDictionary(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.seed = SeedDictionary.load(COMPACTING_FILE, REPLACE_FILE)
+
+    def test_load(self):
+        # Only the keyword linked to every URI, its other labels were never linked
+        self.assertEqual(len(self.seed), 9)
+        self.assertIn("Cloud  Computing", self.seed)
+        self.assertIsNone(self.seed.get("computación en la nube"))
+        self.assertEqual(len(SeedDictionary.load("files/seed_dictionary/missing.csv")), 0)
+
+    def test_shared_labels(self):
+        # Labels of other URIs don't change the URI a keyword was linked to
+        self.assertEqual(self.seed.get("e-learning"), "http://www.wikidata.org/entity/Q1068473")
+        self.assertEqual(self.seed.get("tierra"), "http://www.wikidata.org/entity/Q8486")
+        # A keyword linked to several URIs takes the URI assigned to more researchers
+        self.assertEqual(self.seed.get("earth"), "http://www.wikidata.org/entity/Q2")
+
+    def test_link(self):
+        # Only the seeded endpoint, the other one is left to the linkers
+        self.assertEqual(self.seed.link("cloud computing"), {'Wikidata': "http://www.wikidata.org/entity/Q483639"})
+        self.assertEqual(self.seed.link("epidemiology plant disease", "epidemiology plant diseases"),
+                         {'DBpedia': "http://dbpedia.org/resource/Epidemiology"})
+        # The keyword is used when the lemma is not known
+        self.assertEqual(self.seed.link("statistics", "statistic"),
+                         {'Wikidata': "http://www.wikidata.org/entity/Q12483"})
+        self.assertIsNone(self.seed.link("quantum chemistry"))
+
+    def test_find_labels(self):
+        self.assertEqual(self.seed.find_labels("Statistics in Medicine and Law"),
+                         [("statistics", "http://www.wikidata.org/entity/Q12483"),
+                          ("medicine", "http://www.wikidata.org/entity/Q11190"),
+                          ("law", "http://www.wikidata.org/entity/Q7748")])
+        # Only whole words
+        self.assertEqual(self.seed.find_labels("lawful epidemiology plant diseases"),
+                         [("epidemiology plant diseases", "http://dbpedia.org/resource/Epidemiology")])
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_iter(self):
+        matcher = AhoCorasick(["he", "she", "his", "hers"])
+        self.assertEqual(sorted(matcher.iter("ushers")), [(1, "she"), (2, "he"), (2, "hers")])
+        self.assertEqual(list(matcher.iter("xyz")), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+import pandas as pd
+
+from stopwords_filter import remove_stopwords, remove_stopwords_batch, remove_stopwords_series, stopword_set
+
+
+class TestStopwordsFilter(unittest.TestCase):
+
+    def test_stopword_set_built_once(self):
+        self.assertIs(stopword_set('en'), stopword_set('en'))
+
+    def test_stopword_set_unknown_language(self):
+        self.assertEqual(stopword_set('de'), frozenset())
+
+    def test_remove_stopwords(self):
+        sentence = "This is a sample sentence, showing off the stop words filtration."
+        result = ['This', 'sample', 'sentence', ',', 'showing', 'stop', 'words', 'filtration', '.']
+
+        self.assertEqual(remove_stopwords(sentence, 'en'), result)
+
+    def test_remove_stopwords_batch(self):
+        sentences = ["Esto es un pequeño ejemlo mostrando el filtrado de las palabras de parada",
+                     "Aixo es un petit exemple que ensenya el filte de les paraules de parada"]
+        result = [['Esto', 'pequeño', 'ejemlo', 'mostrando', 'filtrado', 'palabras', 'parada'],
+                  ['Aixo', 'petit', 'exemple', 'que', 'ensenya', 'filte', 'paraules', 'parada']]
+
+        self.assertEqual(remove_stopwords_batch(sentences, ['es', 'ca']), result)
+
+    def test_remove_stopwords_series(self):
+        keywords = pd.Series(["the semantic web", "", "la web semántica"], index=[3, 7, 9])
+        result = remove_stopwords_series(keywords, ['en', 'en', 'es'])
+
+        self.assertListEqual(list(result.index), [3, 7, 9])
+        self.assertListEqual(list(result), [['semantic', 'web'], [], ['web', 'semántica']])
+
+
+if __name__ == '__main__':
+    unittest.main()